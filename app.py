@@ -1,8 +1,14 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from flask_cors import CORS
 import pymongo
+from bson import ObjectId
 from datetime import datetime
 import os
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter, cursor_values, page_size, DEFAULT_PAGE_SIZE
+from services.note_search import NoteSearch, note_terms
+from services.task_bulk import TaskBulkProcessor, parse_items
+from services.task_reminders import reminder_settings
+from utils.fragment_cache import FragmentCache
 
 app = Flask(__name__)
 CORS(app)
@@ -15,6 +21,62 @@ users_collection = db["users"]
 notes_collection = db["notes"]
 tasks_collection = db["tasks"]
 
+# List views are keyset-paginated per user; _id breaks ties between equal timestamps
+notes_collection.create_index([('username', 1), ('created_at', -1), ('_id', -1)])
+tasks_collection.create_index([('username', 1), ('due_date', 1), ('_id', 1)])
+
+note_search = NoteSearch(notes_collection)
+note_search.ensure_indexes()
+
+# Rendered notes/tasks panels per user; every note or task write bumps the user's version
+dashboard_cache = FragmentCache()
+
+NOTES_SORT = [('created_at', -1), ('_id', -1)]
+TASKS_SORT = [('due_date', 1), ('_id', 1)]
+PREVIEW_LENGTH = 200
+
+def _preview(field):
+    # Computed server-side so list pages never transfer full note or task bodies
+    return {'$substrCP': [{'$ifNull': [f'${field}', '']}, 0, PREVIEW_LENGTH]}
+
+NOTE_SUMMARY = {'title': 1, 'created_at': 1, 'preview': _preview('content')}
+TASK_SUMMARY = {'title': 1, 'due_date': 1, 'status': 1, 'preview': _preview('description')}
+
+def _serialize(document):
+    document['id'] = str(document.pop('_id'))
+    return document
+
+def _fetch_page(collection, sort, projection, username, limit, cursor=None):
+    """One keyset page of a user's documents; returns (items, next_cursor)"""
+    query = {'username': username}
+    if cursor:
+        query = {'$and': [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+    page = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    next_cursor = encode_cursor(cursor_values(page[limit - 1], sort)) if len(page) > limit else None
+    return [_serialize(doc) for doc in page[:limit]], next_cursor
+
+def _list_page(collection, sort, projection):
+    """One keyset page of the session user's documents, as requested by limit/cursor args"""
+    return _fetch_page(
+        collection, sort, projection, session['username'],
+        page_size(request.args.get('limit')), request.args.get('cursor')
+    )
+
+def _dashboard_panels(username):
+    """Rendered first pages of the notes and tasks panels, cached until the user's next write"""
+    panels = dashboard_cache.get(username)
+    if panels is None:
+        # Read the version first so a write landing mid-render is never cached as current
+        version = dashboard_cache.version(username)
+        notes, notes_cursor = _fetch_page(notes_collection, NOTES_SORT, NOTE_SUMMARY, username, DEFAULT_PAGE_SIZE)
+        tasks, tasks_cursor = _fetch_page(tasks_collection, TASKS_SORT, TASK_SUMMARY, username, DEFAULT_PAGE_SIZE)
+        panels = {
+            'notes_panel': render_template('partials/notes_panel.html', notes=notes, next_cursor=notes_cursor),
+            'tasks_panel': render_template('partials/tasks_panel.html', tasks=tasks, next_cursor=tasks_cursor)
+        }
+        dashboard_cache.put(username, version, panels)
+    return panels
+
 # Authentication Routes
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -72,10 +134,7 @@ def dashboard():
         return redirect(url_for('login'))
     
     username = session['username']
-    user_notes = notes_collection.find({'username': username}).sort('created_at', -1)
-    user_tasks = tasks_collection.find({'username': username}).sort('due_date', 1)
-    
-    return render_template('dashboard.html', username=username, notes=user_notes, tasks=user_tasks)
+    return render_template('dashboard.html', username=username, **_dashboard_panels(username))
 
 # API Routes
 @app.route('/api/notes', methods=['GET', 'POST'])
@@ -84,8 +143,11 @@ def handle_notes():
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
     if request.method == 'GET':
-        notes = list(notes_collection.find({'username': session['username']}))
-        return jsonify({'success': True, 'notes': notes})
+        try:
+            notes, next_cursor = _list_page(notes_collection, NOTES_SORT, NOTE_SUMMARY)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'notes': notes, 'next_cursor': next_cursor})
     
     if request.method == 'POST':
         data = request.get_json()
@@ -93,32 +155,86 @@ def handle_notes():
             'username': session['username'],
             'title': data.get('title'),
             'content': data.get('content'),
+            'terms': note_terms(data.get('title'), data.get('content')),
             'created_at': datetime.now()
         }
         notes_collection.insert_one(note)
+        dashboard_cache.bump(session['username'])
         return jsonify({'success': True, 'message': 'Note created'})
 
+@app.route('/api/notes/search', methods=['GET'])
+def search_notes():
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'}), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'message': 'Search query is required'}), 400
+    results = note_search.search(session['username'], query, page_size(request.args.get('limit')))
+    return jsonify({'success': True, 'query': query, 'results': results})
+
+@app.route('/api/notes/<note_id>', methods=['GET'])
+def get_note(note_id):
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'}), 401
+    if not ObjectId.is_valid(note_id):
+        return jsonify({'success': False, 'message': 'Note not found'}), 404
+
+    note = notes_collection.find_one({'_id': ObjectId(note_id), 'username': session['username']})
+    if not note:
+        return jsonify({'success': False, 'message': 'Note not found'}), 404
+    return jsonify({'success': True, 'note': _serialize(note)})
+
 @app.route('/api/tasks', methods=['GET', 'POST'])
 def handle_tasks():
     if 'username' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
     if request.method == 'GET':
-        tasks = list(tasks_collection.find({'username': session['username']}))
-        return jsonify({'success': True, 'tasks': tasks})
+        try:
+            tasks, next_cursor = _list_page(tasks_collection, TASKS_SORT, TASK_SUMMARY)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'tasks': tasks, 'next_cursor': next_cursor})
     
     if request.method == 'POST':
         data = request.get_json()
+        try:
+            reminders = reminder_settings(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         task = {
             'username': session['username'],
             'title': data.get('title'),
             'description': data.get('description'),
             'due_date': datetime.strptime(data.get('due_date'), '%Y-%m-%d'),
             'status': 'pending',
+            **reminders,
             'created_at': datetime.now()
         }
         tasks_collection.insert_one(task)
+        dashboard_cache.bump(session['username'])
         return jsonify({'success': True, 'message': 'Task created'})
 
+@app.route('/api/tasks/bulk', methods=['POST'])
+def bulk_tasks():
+    """Create, update and complete many tasks at once (JSON array or NDJSON body)"""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'}), 401
+
+    try:
+        items = parse_items(request.get_data(), request.content_type)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    results, summary = TaskBulkProcessor(tasks_collection).apply(items, session['username'])
+    if any(result['status'] != 'error' for result in results):
+        dashboard_cache.bump(session['username'])
+    return jsonify({
+        'success': 'error' not in summary,
+        'summary': summary,
+        'results': results
+    })
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -20,8 +20,10 @@ def create_app(config_class=Config):
     # Register blueprints
     from app.routes.auth import auth
     from app.routes.gamification import gamification
+    from routes.challenges import challenges
     
     app.register_blueprint(auth)
     app.register_blueprint(gamification)
+    app.register_blueprint(challenges)
     
     return app
\ No newline at end of file
@@ -17,3 +17,12 @@ class Config:
     DAILY_CHALLENGE_XP = 50
     WEEKLY_CHALLENGE_XP = 200
     MONTHLY_CHALLENGE_XP = 500
+    # User challenges finished longer ago than this move to user_challenges_archive
+    CHALLENGE_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHALLENGE_ARCHIVE_AFTER_DAYS', 30))
+    
+    # Leaderboard settings (in-memory sorted sets when no Redis URL is set)
+    LEADERBOARD_REDIS_URL = os.environ.get('LEADERBOARD_REDIS_URL')
+
+    # Per-process cache of user progress documents
+    PROGRESS_CACHE_SIZE = int(os.environ.get('PROGRESS_CACHE_SIZE', 10000))
+    PROGRESS_CACHE_TTL = int(os.environ.get('PROGRESS_CACHE_TTL', 60))
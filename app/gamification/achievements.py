@@ -1,5 +1,21 @@
+import math
+import asyncio
+import logging
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
+
+from app.gamification.progress_cache import ProgressCache
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Level L starts at 25 * L^2 XP (level 1 at 0); LEVEL_XP[i] is the XP needed for level i + 1
+LEVEL_XP_STEP = 25
+MAX_TABLE_LEVEL = 1000
+LEVEL_XP = [0] + [LEVEL_XP_STEP * level ** 2 for level in range(2, MAX_TABLE_LEVEL + 1)]
 
 class Achievement:
     ACHIEVEMENTS = {
@@ -8,35 +24,40 @@ class Achievement:
             'description': 'Complete all tasks for a course',
             'icon': '📚',
             'points': 100,
-            'requirement': 50  # tasks completed
+            'requirement': 50,  # tasks completed
+            'stat': 'total_tasks_completed'
         },
         'PERFECT_ATTENDANCE': {
             'name': 'Perfect Attendance',
             'description': 'Log in daily for a week',
             'icon': '🎯',
             'points': 50,
-            'requirement': 7  # days
+            'requirement': 7,  # days
+            'stat': 'daily_streak'
         },
         'NOTE_TAKER_NOVICE': {
             'name': 'Novice Note Taker',
             'description': 'Create 10 notes',
             'icon': '📝',
             'points': 30,
-            'requirement': 10  # notes
+            'requirement': 10,  # notes
+            'stat': 'total_notes'
         },
         'NOTE_TAKER_EXPERT': {
             'name': 'Expert Note Taker',
             'description': 'Create 50 notes',
             'icon': '📝',
             'points': 100,
-            'requirement': 50  # notes
+            'requirement': 50,  # notes
+            'stat': 'total_notes'
         },
         'TIME_MANAGER': {
             'name': 'Time Manager',
             'description': 'Complete 20 tasks before deadlines',
             'icon': '⏰',
             'points': 75,
-            'requirement': 20  # on-time tasks
+            'requirement': 20,  # on-time tasks
+            'stat': 'tasks_completed_on_time'
         }
     }
 
@@ -49,6 +70,7 @@ class Achievement:
         self.icon = achievement_data['icon']
         self.points = achievement_data['points']
         self.requirement = achievement_data['requirement']
+        self.stat = achievement_data['stat']
         self.completed = completed
         self.completed_at = None
         self.progress = 0
@@ -67,6 +89,27 @@ class Achievement:
             "progress": self.progress
         }
 
+    def to_document(self):
+        """Stored form: per-user state only, static metadata comes from ACHIEVEMENTS"""
+        return {
+            "key": self.key,
+            "progress": self.progress,
+            "completed": self.completed,
+            "completed_at": self.completed_at
+        }
+
+    @staticmethod
+    def from_dict(user_id, data):
+        achievement = Achievement(user_id, data["key"], data.get("completed", False))
+        achievement.completed_at = data.get("completed_at")
+        achievement.progress = data.get("progress", 0)
+        return achievement
+
+# Inverted index of the catalog: stat name -> keys of the achievements that depend on it
+Achievement.STAT_INDEX = {}
+for _key, _rule in Achievement.ACHIEVEMENTS.items():
+    Achievement.STAT_INDEX.setdefault(_rule['stat'], []).append(_key)
+
 class UserProgress:
     XP_REWARDS = {
         'create_note': 10,
@@ -76,8 +119,9 @@ class UserProgress:
         'study_streak': 15
     }
 
-    def __init__(self, user_id):
+    def __init__(self, user_id, cohort=None):
         self.user_id = user_id
+        self.cohort = cohort
         self.xp = 0
         self.level = 1
         self.achievements = self._initialize_achievements()
@@ -93,27 +137,116 @@ class UserProgress:
         }
         self.last_activity = None
         self.study_streak_start = None
+        # XP earned before activity_counts were tracked; None until seeded for older documents
+        self.xp_baseline = 0
+        # Incremented by every write to the stored document
+        self.version = 0
+        # Stats touched since the last achievement check
+        self.changed_stats = set()
+        # Catalog achievements missing from the stored document
+        self.unsaved_achievements = []
 
     def _initialize_achievements(self):
         return [Achievement(self.user_id, key) for key in Achievement.ACHIEVEMENTS]
 
-    def to_dict(self):
+    @staticmethod
+    def from_dict(data):
+        progress = UserProgress(data["user_id"], data.get("cohort"))
+        progress.xp = data.get("xp", 0)
+        progress.level = data.get("level", 1)
+        progress.daily_streak = data.get("daily_streak", 0)
+        progress.last_login = data.get("last_login")
+        progress.stats.update(data.get("stats", {}))
+        progress.last_activity = data.get("last_activity")
+        progress.study_streak_start = data.get("study_streak_start")
+        progress.version = data.get("version", 0)
+        progress.xp_baseline = data.get("xp_baseline")
+
+        stored = {
+            a["key"]: a for a in data.get("achievements", [])
+            if a.get("key") in Achievement.ACHIEVEMENTS
+        }
+        progress.achievements = []
+        for key in Achievement.ACHIEVEMENTS:
+            if key in stored:
+                progress.achievements.append(Achievement.from_dict(progress.user_id, stored[key]))
+            else:
+                achievement = Achievement(progress.user_id, key)
+                progress.achievements.append(achievement)
+                progress.unsaved_achievements.append(achievement)
+                # Evaluate new catalog entries against the current stats once
+                progress.changed_stats.add(achievement.stat)
+        return progress
+
+    def get_stat(self, name):
+        if name in self.stats:
+            return self.stats[name]
+        return getattr(self, name, 0)
+
+    def _serialize(self, achievements):
         return {
             "user_id": str(self.user_id),
+            "cohort": self.cohort,
             "xp": self.xp,
             "level": self.level,
-            "achievements": [a.to_dict() for a in self.achievements],
+            "achievements": achievements,
             "daily_streak": self.daily_streak,
             "last_login": self.last_login,
             "stats": self.stats,
             "last_activity": self.last_activity,
-            "study_streak_start": self.study_streak_start
+            "study_streak_start": self.study_streak_start,
+            "xp_baseline": self.xp_baseline,
+            "version": self.version
         }
 
+    def to_dict(self):
+        return self._serialize([a.to_dict() for a in self.achievements])
+
+    def to_document(self):
+        """Stored form of the progress; achievements are hydrated from the catalog on read"""
+        return self._serialize([a.to_document() for a in self.achievements])
+
     @staticmethod
     def calculate_level(xp):
         # Enhanced level calculation with diminishing returns
-        return max(1, int((xp ** 0.5) / 5))
+        if xp < LEVEL_XP[-1]:
+            return bisect_right(LEVEL_XP, xp)
+        return math.isqrt(int(xp) // LEVEL_XP_STEP)
+
+    @staticmethod
+    def xp_for_level(level):
+        """Total XP at which `level` is reached"""
+        if level <= 1:
+            return 0
+        if level <= MAX_TABLE_LEVEL:
+            return LEVEL_XP[level - 1]
+        return LEVEL_XP_STEP * level ** 2
+
+    @classmethod
+    def tracked_xp(cls, data):
+        """XP a stored document earned from its `activity_counts` and completed achievements"""
+        counts = data.get("activity_counts") or {}
+        xp = sum(cls.XP_REWARDS.get(activity, 0) * count for activity, count in counts.items())
+        xp += sum(
+            Achievement.ACHIEVEMENTS[a["key"]]["points"]
+            for a in data.get("achievements", [])
+            if a.get("completed") and a.get("key") in Achievement.ACHIEVEMENTS
+        )
+        return xp
+
+    @classmethod
+    def recompute(cls, data):
+        """Rebuild (xp, level) for a stored document from the current reward tables.
+
+        XP is `xp_baseline` (earned before activity_counts were tracked, kept
+        as-is) plus the tracked XP. Returns None for documents whose baseline
+        has not been seeded yet, since their counts are incomplete.
+        """
+        baseline = data.get("xp_baseline")
+        if baseline is None:
+            return None
+        xp = baseline + cls.tracked_xp(data)
+        return xp, cls.calculate_level(xp)
 
     def add_xp(self, points):
         self.xp += points
@@ -123,103 +256,333 @@ class UserProgress:
             return True
         return False
 
-    def update_login_streak(self):
-        now = datetime.now()
-        if not self.last_login:
-            self.daily_streak = 1
-        else:
-            days_diff = (now - self.last_login).days
-            if days_diff == 1:
-                self.daily_streak += 1
-            elif days_diff > 1:
-                self.daily_streak = 1
-        self.last_login = now
-        self.add_xp(self.XP_REWARDS['daily_login'])
-
-    def record_activity(self, activity_type, additional_data=None):
-        now = datetime.now()
-        self.last_activity = now
-
-        if activity_type in self.XP_REWARDS:
-            self.add_xp(self.XP_REWARDS[activity_type])
-
+    @classmethod
+    def activity_increments(cls, activity_type, additional_data=None):
+        """XP and stat increments for one activity"""
+        additional_data = additional_data or {}
+        increments = {}
         if activity_type == 'create_note':
-            self.stats['total_notes'] += 1
+            increments['total_notes'] = 1
         elif activity_type == 'complete_task':
-            self.stats['total_tasks_completed'] += 1
-            if additional_data and additional_data.get('on_time', False):
-                self.stats['tasks_completed_on_time'] += 1
+            increments['total_tasks_completed'] = 1
+            if additional_data.get('on_time', False):
+                increments['tasks_completed_on_time'] = 1
         elif activity_type == 'study_session':
-            self.stats['study_sessions'] += 1
-            if additional_data and 'duration' in additional_data:
-                self.stats['study_time'] += additional_data['duration']
-            
-            if not self.study_streak_start:
-                self.study_streak_start = now
-            elif (now - self.study_streak_start).days > 1:
-                self.study_streak_start = now
-
-            streak_days = (now - self.study_streak_start).days + 1
-            self.stats['longest_study_streak'] = max(
-                self.stats['longest_study_streak'],
-                streak_days
-            )
+            increments['study_sessions'] = 1
+            if 'duration' in additional_data:
+                increments['study_time'] = additional_data['duration']
+        return cls.XP_REWARDS.get(activity_type, 0), increments
 
 class GamificationSystem:
-    def __init__(self, db):
+    # Pipeline expression for the version bump every write applies
+    VERSION_BUMP = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+    def __init__(self, db, leaderboard=None, activity_log=None, cache=None, cohort_lookup=None):
         self.db = db
         self.progress_collection = db.user_progress
+        self.leaderboard = leaderboard
+        self.activity_log = activity_log
+        self.cache = cache if cache is not None else ProgressCache()
+        # Callable mapping a list of user ids to {user_id: cohort}; writes store the result as `cohort`
+        self.cohort_lookup = cohort_lookup
+
+    def _cache_progress(self, progress):
+        """Cache the stored form of `progress`; achievements not yet pushed are left out,
+        so whoever hydrates the entry still sees them as unsaved"""
+        document = progress.to_document()
+        if progress.unsaved_achievements:
+            unsaved = {a.key for a in progress.unsaved_achievements}
+            document["achievements"] = [a for a in document["achievements"] if a["key"] not in unsaved]
+        self.cache.put(progress.user_id, document)
+
+    def _cohorts(self, user_ids):
+        """{str(user_id): cohort} for the users the lookup knows; a failed lookup leaves cohorts as stored"""
+        if self.cohort_lookup is None or not user_ids:
+            return {}
+        try:
+            cohorts = self.cohort_lookup(list(user_ids))
+        except Exception as e:
+            logger.error(f"Error looking up cohorts for {len(user_ids)} users: {str(e)}")
+            return {}
+        return {str(user_id): cohort for user_id, cohort in cohorts.items() if cohort}
+
+    async def load_leaderboard(self, batch_size=1000):
+        """Fill the leaderboard from user_progress; returns the number of users loaded.
+
+        Run once at startup: an in-memory leaderboard starts empty in every
+        process, and a Redis one may predate the documents. Setting absolute
+        XP is idempotent, so reloading is harmless.
+        """
+        if self.leaderboard is None:
+            return 0
+        loaded = 0
+        batch = []
+        cursor = self.progress_collection.find({}, {"_id": 0, "user_id": 1, "xp": 1, "cohort": 1})
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                loaded += self._load_batch(batch)
+                batch = []
+        if batch:
+            loaded += self._load_batch(batch)
+        return loaded
+
+    def _load_batch(self, docs):
+        # Documents written before cohorts were stored get theirs from the lookup
+        cohorts = self._cohorts([doc["user_id"] for doc in docs if not doc.get("cohort")])
+        self.leaderboard.set_many(
+            (doc["user_id"], doc.get("xp", 0), doc.get("cohort") or cohorts.get(doc["user_id"]))
+            for doc in docs
+        )
+        return len(docs)
+
+    def _sync_leaderboard(self, progress, previous_cohort=None):
+        if self.leaderboard is not None:
+            self.leaderboard.set_xp(progress.user_id, progress.xp, progress.cohort, previous_cohort)
+
+    async def _log_activities(self, events):
+        if self.activity_log is not None:
+            await self.activity_log.record_many(events)
 
     async def get_user_progress(self, user_id):
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return UserProgress.from_dict(cached)
+
         progress_data = await self.progress_collection.find_one({"user_id": str(user_id)})
         if not progress_data:
-            progress = UserProgress(user_id)
-            await self.progress_collection.insert_one(progress.to_dict())
-            return progress
-        return UserProgress(**progress_data)
-
-    async def update_user_progress(self, progress):
-        await self.progress_collection.update_one(
-            {"user_id": str(progress.user_id)},
-            {"$set": progress.to_dict()},
-            upsert=True
+            progress = UserProgress(user_id, self._cohorts([user_id]).get(str(user_id)))
+            await self.progress_collection.insert_one(progress.to_document())
+        else:
+            progress = UserProgress.from_dict(progress_data)
+        self._cache_progress(progress)
+        return progress
+
+    @staticmethod
+    def _defaults_stage(user_id, cohort=None):
+        """Pipeline stage that seeds a brand-new (upserted) progress document.
+
+        A known `cohort` is (re)written every time; without one the stored
+        cohort is kept. The value it replaces is saved as `previous_cohort`,
+        so after a department change the caller can take the user out of
+        the old cohort's leaderboard set.
+        """
+        defaults = UserProgress(user_id).to_document()
+        return {"$set": {
+            "cohort": cohort if cohort else {"$ifNull": ["$cohort", None]},
+            "previous_cohort": {"$ifNull": ["$cohort", None]},
+            # Only a document created here starts with complete activity_counts
+            "xp_baseline": {"$ifNull": ["$xp_baseline", {"$cond": [
+                {"$eq": [{"$ifNull": ["$xp", None]}, None]}, 0, None
+            ]}]},
+            "xp": {"$ifNull": ["$xp", 0]},
+            "level": {"$ifNull": ["$level", 1]},
+            "daily_streak": {"$ifNull": ["$daily_streak", 0]},
+            "last_login": {"$ifNull": ["$last_login", None]},
+            "study_streak_start": {"$ifNull": ["$study_streak_start", None]},
+            "achievements": {"$ifNull": ["$achievements", {"$literal": defaults["achievements"]}]},
+            **{
+                f"stats.{stat}": {"$ifNull": [f"$stats.{stat}", 0]}
+                for stat in defaults["stats"]
+            }
+        }}
+
+    @staticmethod
+    def _level_stage():
+        # floor(sqrt(xp / LEVEL_XP_STEP)): the LEVEL_XP curve, evaluated server-side; levels never go down
+        return {"$set": {"level": {"$max": [
+            "$level", 1, {"$toInt": {"$floor": {"$sqrt": {"$divide": ["$xp", LEVEL_XP_STEP]}}}}
+        ]}}}
+
+    @staticmethod
+    def _count_fields(activity_counts):
+        return {
+            f"activity_counts.{activity}": {"$add": [{"$ifNull": [f"$activity_counts.{activity}", 0]}, count]}
+            for activity, count in (activity_counts or {}).items()
+            if activity in UserProgress.XP_REWARDS
+        }
+
+    def _activity_pipeline(self, user_id, xp, increments, now, study_sessions=0, activity_counts=None, cohort=None):
+        """Update pipeline applying (possibly aggregated) activity increments server-side"""
+        stage = {
+            "xp": {"$add": ["$xp", xp]},
+            "last_activity": now,
+            "version": self.VERSION_BUMP,
+            **{f"stats.{stat}": {"$add": [f"$stats.{stat}", amount]} for stat, amount in increments.items()},
+            **self._count_fields(activity_counts)
+        }
+        pipeline = [self._defaults_stage(user_id, cohort), {"$set": stage}]
+
+        if study_sessions:
+            pipeline.append({"$set": {"study_streak_start": {"$cond": [
+                {"$or": [
+                    {"$eq": ["$study_streak_start", None]},
+                    {"$gte": [{"$subtract": [now, "$study_streak_start"]}, 2 * DAY_MS]}
+                ]},
+                now,
+                "$study_streak_start"
+            ]}}})
+            pipeline.append({"$set": {"stats.longest_study_streak": {"$max": [
+                "$stats.longest_study_streak",
+                {"$add": [{"$floor": {"$divide": [{"$subtract": [now, "$study_streak_start"]}, DAY_MS]}}, 1]}
+            ]}}})
+
+        pipeline.append(self._level_stage())
+        return pipeline
+
+    async def record_activity(self, user_id, activity_type, additional_data=None):
+        """Apply an activity in a single atomic round trip; returns (progress, old_level)"""
+        xp, increments = UserProgress.activity_increments(activity_type, additional_data)
+        study_sessions = increments.get('study_sessions', 0)
+
+        now = datetime.now()
+        cohort = self._cohorts([user_id]).get(str(user_id))
+        progress_data, _ = await asyncio.gather(
+            self.progress_collection.find_one_and_update(
+                {"user_id": str(user_id)},
+                self._activity_pipeline(
+                    user_id, xp, increments, now, study_sessions, {activity_type: 1}, cohort
+                ),
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            ),
+            self._log_activities([(user_id, activity_type, additional_data, now)])
         )
+        progress = UserProgress.from_dict(progress_data)
+        progress.changed_stats.update(increments)
+        if study_sessions:
+            progress.changed_stats.add('longest_study_streak')
+        self._cache_progress(progress)
+
+        old_level = UserProgress.calculate_level(progress.xp - xp)
+        self._sync_leaderboard(progress, progress_data.get("previous_cohort"))
+        await self.check_achievements(progress)
+        return progress, old_level
+
+    async def record_daily_login(self, user_id):
+        """Update the login streak and award login XP in a single atomic round trip"""
+        now = datetime.now()
+        days_since = {"$floor": {"$divide": [{"$subtract": [now, "$last_login"]}, DAY_MS]}}
+        cohort = self._cohorts([user_id]).get(str(user_id))
+        progress_data, _ = await asyncio.gather(self.progress_collection.find_one_and_update(
+            {"user_id": str(user_id)},
+            [
+                self._defaults_stage(user_id, cohort),
+                {"$set": {
+                    "daily_streak": {"$switch": {
+                        "branches": [
+                            {"case": {"$eq": ["$last_login", None]}, "then": 1},
+                            {"case": {"$eq": [days_since, 1]}, "then": {"$add": ["$daily_streak", 1]}},
+                            {"case": {"$gt": [days_since, 1]}, "then": 1}
+                        ],
+                        "default": "$daily_streak"
+                    }},
+                    "last_login": now,
+                    "version": self.VERSION_BUMP,
+                    "xp": {"$add": ["$xp", UserProgress.XP_REWARDS['daily_login']]},
+                    **self._count_fields({'daily_login': 1})
+                }},
+                self._level_stage()
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        ), self._log_activities([(user_id, 'daily_login', None, now)]))
+        progress = UserProgress.from_dict(progress_data)
+        progress.changed_stats.add('daily_streak')
+        self._cache_progress(progress)
+        self._sync_leaderboard(progress, progress_data.get("previous_cohort"))
+        await self.check_achievements(progress)
+        return progress
+
+    async def check_achievements(self, progress, changed_stats=None):
+        """Re-evaluate only the achievements that depend on stats changed since the last check"""
+        if changed_stats is None:
+            changed_stats = progress.changed_stats
+        progress.changed_stats = set()
 
-    async def check_achievements(self, progress):
-        updated = False
-        stats = progress.stats
+        keys = set()
+        for stat in changed_stats:
+            keys.update(Achievement.STAT_INDEX.get(stat, ()))
+        if not keys:
+            return False
 
+        changed, completed = [], []
         for achievement in progress.achievements:
-            if achievement.completed:
+            if achievement.key not in keys or achievement.completed:
                 continue
 
-            if achievement.key == 'COURSE_MASTER':
-                achievement.progress = min(100, (stats['total_tasks_completed'] / achievement.requirement) * 100)
-                if stats['total_tasks_completed'] >= achievement.requirement:
-                    updated = self._complete_achievement(achievement, progress)
+            value = progress.get_stat(achievement.stat)
+            if value >= achievement.requirement:
+                if self._complete_achievement(achievement, progress):
+                    completed.append(achievement)
+            else:
+                new_progress = min(100, (value / achievement.requirement) * 100)
+                if new_progress != achievement.progress:
+                    achievement.progress = new_progress
+                    changed.append(achievement)
 
-            elif achievement.key == 'PERFECT_ATTENDANCE':
-                achievement.progress = min(100, (progress.daily_streak / achievement.requirement) * 100)
-                if progress.daily_streak >= achievement.requirement:
-                    updated = self._complete_achievement(achievement, progress)
+        if changed or completed or progress.unsaved_achievements:
+            await self._save_achievement_changes(progress, changed, completed)
+        return bool(completed)
 
-            elif achievement.key == 'NOTE_TAKER_NOVICE':
-                achievement.progress = min(100, (stats['total_notes'] / achievement.requirement) * 100)
-                if stats['total_notes'] >= achievement.requirement:
-                    updated = self._complete_achievement(achievement, progress)
+    async def _save_achievement_changes(self, progress, changed, completed):
+        """Persist only the achievement fields that changed, in one bulk_write"""
+        user_filter = {"user_id": str(progress.user_id)}
+        operations = []
 
-            elif achievement.key == 'NOTE_TAKER_EXPERT':
-                achievement.progress = min(100, (stats['total_notes'] / achievement.requirement) * 100)
-                if stats['total_notes'] >= achievement.requirement:
-                    updated = self._complete_achievement(achievement, progress)
+        for achievement in progress.unsaved_achievements:
+            operations.append(UpdateOne(
+                {**user_filter, "achievements.key": {"$ne": achievement.key}},
+                {
+                    "$push": {"achievements": Achievement(progress.user_id, achievement.key).to_document()},
+                    "$inc": {"version": 1}
+                }
+            ))
+        progress.unsaved_achievements = []
 
-            elif achievement.key == 'TIME_MANAGER':
-                achievement.progress = min(100, (stats['tasks_completed_on_time'] / achievement.requirement) * 100)
-                if stats['tasks_completed_on_time'] >= achievement.requirement:
-                    updated = self._complete_achievement(achievement, progress)
+        if changed:
+            operations.append(UpdateOne(
+                user_filter,
+                {
+                    "$set": {f"achievements.$[a{i}].progress": a.progress for i, a in enumerate(changed)},
+                    "$inc": {"version": 1}
+                },
+                array_filters=[{f"a{i}.key": a.key} for i, a in enumerate(changed)]
+            ))
 
-        if updated:
-            await self.update_user_progress(progress)
+        # Completion is guarded on the stored flag so the XP is only ever awarded once
+        for achievement in completed:
+            operations.append(UpdateOne(
+                {**user_filter, "achievements": {"$elemMatch": {"key": achievement.key, "completed": False}}},
+                {
+                    "$set": {
+                        "achievements.$.completed": True,
+                        "achievements.$.completed_at": achievement.completed_at,
+                        "achievements.$.progress": 100
+                    },
+                    "$inc": {"xp": achievement.points, "version": 1}
+                }
+            ))
+        if completed:
+            operations.append(UpdateOne(user_filter, {"$max": {"level": progress.level}, "$inc": {"version": 1}}))
+
+        try:
+            result = await self.progress_collection.bulk_write(operations, ordered=True)
+        except BaseException:
+            self.cache.invalidate(progress.user_id)
+            raise
+        # Every operation bumps the version once; if one did not apply (a push that was
+        # already there, a completion another worker got to first) the in-memory copy is off
+        if result.modified_count == len(operations):
+            progress.version += len(operations)
+            self._cache_progress(progress)
+        else:
+            self.cache.invalidate(progress.user_id)
+        if completed and self.leaderboard is not None:
+            # Completion points only count if the guarded update applied, so rank by what was stored
+            stored = await self.progress_collection.find_one(user_filter, {"_id": 0, "xp": 1, "cohort": 1})
+            if stored:
+                self.leaderboard.set_xp(progress.user_id, stored.get("xp", 0), stored.get("cohort"))
 
     def _complete_achievement(self, achievement, progress):
         if not achievement.completed:
@@ -229,3 +592,50 @@ class GamificationSystem:
             progress.add_xp(achievement.points)
             return True
         return False
+
+    @classmethod
+    def backfill_query(cls, key, now=None):
+        """Filters and update pipeline that apply one catalog achievement to every stored document.
+
+        Returns (update_filter, award_filter, pipeline). Documents without the
+        achievement get a compact entry with progress evaluated against their
+        stats; documents whose stat already meets the requirement are completed
+        and credited the points. Entries already completed are never touched.
+        """
+        rule = Achievement.ACHIEVEMENTS[key]
+        stat, requirement = rule['stat'], rule['requirement']
+        path = f"stats.{stat}" if stat in UserProgress(None).stats else stat
+        now = now or datetime.now()
+
+        missing_filter = {"achievements.key": {"$ne": key}}
+        award_filter = {
+            path: {"$gte": requirement},
+            "achievements": {"$not": {"$elemMatch": {"key": key, "completed": True}}}
+        }
+
+        met = {"$gte": [{"$ifNull": [f"${path}", 0]}, requirement]}
+        entry = {
+            "key": key,
+            "progress": {"$cond": [met, 100, {"$min": [
+                100, {"$multiply": [{"$divide": [{"$ifNull": [f"${path}", 0]}, requirement]}, 100]}
+            ]}]},
+            "completed": met,
+            "completed_at": {"$cond": [met, now, None]}
+        }
+        pipeline = [
+            {"$set": {
+                "achievements": {"$cond": [
+                    {"$in": [key, {"$ifNull": ["$achievements.key", []]}]},
+                    {"$map": {
+                        "input": "$achievements",
+                        "as": "a",
+                        "in": {"$cond": [{"$eq": ["$$a.key", key]}, entry, "$$a"]}
+                    }},
+                    {"$concatArrays": [{"$ifNull": ["$achievements", []]}, [entry]]}
+                ]},
+                "xp": {"$add": [{"$ifNull": ["$xp", 0]}, {"$cond": [met, rule['points'], 0]}]},
+                "version": cls.VERSION_BUMP
+            }},
+            cls._level_stage()
+        ]
+        return {"$or": [missing_filter, award_filter]}, award_filter, pipeline
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime, timedelta
+from pymongo import InsertOne, UpdateOne
+
+from app.gamification.achievements import UserProgress
+
+# Activity types that get their own per-day counter; anything else is counted as "other"
+ROLLUP_TYPES = set(UserProgress.XP_REWARDS) | {'study_session'}
+
+class ActivityLog:
+    """Append-only activity events plus per-user monthly rollups.
+
+    Every event is inserted into `activity_log` and, in the same call,
+    `$inc`s the counters for its day in the user's `activity_rollups`
+    document for that month: {user_id, month: "YYYY-MM", days: {"DD": {...}}}.
+    Streaks, heatmaps and weekly summaries read a handful of rollup
+    documents instead of scanning events.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.events_collection = db.activity_log
+        self.rollups_collection = db.activity_rollups
+        self._indexed = False
+
+    async def ensure_indexes(self):
+        if self._indexed:
+            return
+        self._indexed = True
+        await self.events_collection.create_index([("user_id", 1), ("occurred_at", -1)])
+        await self.rollups_collection.create_index([("user_id", 1), ("month", 1)], unique=True)
+
+    @staticmethod
+    def _month(day):
+        return day.strftime('%Y-%m')
+
+    @staticmethod
+    def _counters(activity_type, additional_data):
+        counter = activity_type if activity_type in ROLLUP_TYPES else 'other'
+        counters = {'events': 1, counter: 1}
+        minutes = (additional_data or {}).get('duration') if activity_type == 'study_session' else None
+        if isinstance(minutes, (int, float)) and minutes > 0:
+            counters['study_minutes'] = minutes
+        return counters
+
+    def _operations(self, events):
+        """Build the event inserts and one coalesced rollup $inc per user-month"""
+        inserts = []
+        rollups = {}
+        for user_id, activity_type, additional_data, occurred_at in events:
+            inserts.append(InsertOne({
+                "user_id": str(user_id),
+                "type": activity_type,
+                "data": additional_data or {},
+                "occurred_at": occurred_at
+            }))
+            increments = rollups.setdefault((str(user_id), self._month(occurred_at)), {})
+            for counter, amount in self._counters(activity_type, additional_data).items():
+                field = f"days.{occurred_at.day:02d}.{counter}"
+                increments[field] = increments.get(field, 0) + amount
+
+        updates = [
+            UpdateOne({"user_id": user_id, "month": month}, {"$inc": increments}, upsert=True)
+            for (user_id, month), increments in rollups.items()
+        ]
+        return inserts, updates
+
+    async def record(self, user_id, activity_type, additional_data=None, occurred_at=None):
+        await self.record_many([(user_id, activity_type, additional_data, occurred_at or datetime.now())])
+
+    async def record_many(self, events):
+        """Append a batch of (user_id, type, additional_data, occurred_at) events"""
+        if not events:
+            return
+        await self.ensure_indexes()
+        inserts, updates = self._operations(events)
+        await asyncio.gather(
+            self.events_collection.bulk_write(inserts, ordered=False),
+            self.rollups_collection.bulk_write(updates, ordered=False)
+        )
+
+    async def _daily_counters(self, user_id, start, end):
+        """{date: counters} for every active day between start and end (inclusive)"""
+        await self.ensure_indexes()
+        months = []
+        month = start.replace(day=1)
+        while month <= end:
+            months.append(self._month(month))
+            month = (month + timedelta(days=32)).replace(day=1)
+
+        days = {}
+        async for rollup in self.rollups_collection.find(
+            {"user_id": str(user_id), "month": {"$in": months}},
+            {"_id": 0, "month": 1, "days": 1}
+        ):
+            year, month_number = map(int, rollup["month"].split('-'))
+            for day, counters in rollup.get("days", {}).items():
+                date = datetime(year, month_number, int(day)).date()
+                if start <= date <= end:
+                    days[date] = counters
+        return days
+
+    async def get_heatmap(self, user_id, days=90, today=None):
+        today = today or datetime.now().date()
+        start = today - timedelta(days=days - 1)
+        counters = await self._daily_counters(user_id, start, today)
+        return [
+            {
+                "date": (start + timedelta(days=i)).isoformat(),
+                "events": counters.get(start + timedelta(days=i), {}).get("events", 0),
+                "study_minutes": counters.get(start + timedelta(days=i), {}).get("study_minutes", 0)
+            }
+            for i in range(days)
+        ]
+
+    async def get_streak(self, user_id, today=None):
+        """Consecutive active days ending today (or yesterday, if nothing is logged yet today)"""
+        today = today or datetime.now().date()
+        streak = 0
+        day = today
+        window_end = today
+        while True:
+            # Read the rollups a month-sized window at a time, newest first
+            window_start = window_end - timedelta(days=30)
+            counters = await self._daily_counters(user_id, window_start, window_end)
+            while day >= window_start:
+                if counters.get(day, {}).get("events", 0):
+                    streak += 1
+                elif day != today:
+                    return streak
+                day -= timedelta(days=1)
+            window_end = window_start - timedelta(days=1)
+
+    async def get_weekly_summary(self, user_id, today=None):
+        today = today or datetime.now().date()
+        start = today - timedelta(days=6)
+        counters = await self._daily_counters(user_id, start, today)
+
+        totals = {}
+        for day_counters in counters.values():
+            for counter, amount in day_counters.items():
+                totals[counter] = totals.get(counter, 0) + amount
+        return {
+            "start": start.isoformat(),
+            "end": today.isoformat(),
+            "active_days": sum(1 for c in counters.values() if c.get("events")),
+            "totals": totals,
+            "days": [
+                {"date": (start + timedelta(days=i)).isoformat(), **counters.get(start + timedelta(days=i), {})}
+                for i in range(7)
+            ]
+        }
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BackgroundLoop:
+    """An asyncio event loop running forever on its own daemon thread.
+
+    Flask runs each async view in a short-lived loop of its own and cancels
+    whatever that view left behind, so long-running work started from a
+    request does not survive it. Work submitted here lives as long as the
+    process, and can be handed over from any thread.
+    """
+
+    def __init__(self, name='background-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._loop = asyncio.new_event_loop()
+            started = threading.Event()
+            self._thread = threading.Thread(target=self._serve, args=(started,), name=self.name, daemon=True)
+            self._thread.start()
+            started.wait()
+
+    def _serve(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(started.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future"""
+        if not self.running:
+            coro.close()
+            raise RuntimeError(f"{self.name} is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def call_soon(self, callback, *args):
+        """Run a plain callback on the loop thread"""
+        if not self.running:
+            raise RuntimeError(f"{self.name} is not running")
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout=5):
+        """Cancel whatever is still scheduled and stop the loop thread"""
+        with self._lock:
+            if not self.running:
+                return
+            loop, thread = self._loop, self._thread
+
+            async def cancel_pending():
+                tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            try:
+                asyncio.run_coroutine_threadsafe(cancel_pending(), loop).result(timeout)
+            except Exception as e:
+                logger.error(f"Error cancelling {self.name} tasks: {str(e)}")
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            self._thread = None
@@ -1,6 +1,15 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import List, Dict, Optional
+from pymongo import UpdateOne, UpdateMany, ReplaceOne, DESCENDING
+
+from utils.pagination import keyset_filter, cursor_values, encode_cursor
+
+logger = logging.getLogger(__name__)
 
 class ChallengePeriod(Enum):
     DAILY = "daily"
@@ -122,10 +131,54 @@ class UserChallenge:
         )
 
 class ChallengeSystem:
+    # Upper bound on how long a cached catalog is trusted, so challenges generated
+    # by another worker show up even if no cached challenge has expired yet
+    CATALOG_TTL_SECONDS = 300
+    # Expired challenge definitions are removed by a TTL index this long after end_date;
+    # accepted challenges keep their own embedded copy
+    CHALLENGE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+    # Per-user activity routing: how many users are kept and how long an entry is trusted
+    # before it is reloaded to pick up challenges accepted through another worker. An entry
+    # routing an activity nowhere is only trusted for ROUTE_MISS_TTL_SECONDS, since acting
+    # on it drops the progress for good
+    MAX_ROUTED_USERS = 10000
+    ROUTE_TTL_SECONDS = 300
+    ROUTE_MISS_TTL_SECONDS = 5
+
     def __init__(self, db):
         self.db = db
         self.challenges_collection = db.challenges
         self.user_challenges_collection = db.user_challenges
+        self._indexed = False
+        # period -> {"challenges": [Challenge], "valid_until": datetime}
+        self._catalog: Dict[str, Dict] = {}
+        self._catalog_loaded_at: Optional[float] = None
+        # user_id -> {"types": {activity_type: {user challenge _id}}, "valid_until": datetime, "loaded_at": float}
+        self._routes: OrderedDict = OrderedDict()
+
+    async def ensure_indexes(self):
+        if self._indexed:
+            return
+        self._indexed = True
+        await asyncio.gather(
+            self.challenges_collection.create_index(
+                [("end_date", 1)], expireAfterSeconds=self.CHALLENGE_RETENTION_SECONDS
+            ),
+            # One challenge set per period: regenerating a period is a no-op
+            self.challenges_collection.create_index(
+                [("title", 1), ("period", 1), ("start_date", 1)], unique=True
+            ),
+            # Serves the active/completed filters, their counts and the keyset-paginated listings
+            self.user_challenges_collection.create_index([("user_id", 1), ("completed_at", -1), ("_id", -1)]),
+            # Used by ChallengeArchiver to find finished and abandoned challenges
+            self.user_challenges_collection.create_index([("completed_at", 1)]),
+            self.user_challenges_collection.create_index([("challenge.end_date", 1)]),
+            self.db.user_challenges_archive.create_index([("user_id", 1), ("completed_at", -1)])
+        )
+
+    def invalidate_catalog(self):
+        self._catalog = {}
+        self._catalog_loaded_at = None
 
     def _create_daily_challenges(self) -> List[Challenge]:
         return [
@@ -190,72 +243,360 @@ class ChallengeSystem:
             )
         ]
 
-    async def generate_challenges(self):
-        """Generate new challenges for different periods"""
-        now = datetime.now()
-        
-        # Daily challenges
-        daily_end = datetime.now().replace(hour=23, minute=59, second=59)
-        for challenge in self._create_daily_challenges():
-            challenge.end_date = daily_end
-            await self.challenges_collection.insert_one(challenge.to_dict())
-
-        # Weekly challenges (if it's Monday)
-        if now.weekday() == 0:
-            week_end = now + timedelta(days=6, hours=23-now.hour, minutes=59-now.minute)
-            for challenge in self._create_weekly_challenges():
-                challenge.end_date = week_end
-                await self.challenges_collection.insert_one(challenge.to_dict())
+    @staticmethod
+    def period_bounds(period: ChallengePeriod, now: datetime) -> tuple:
+        """(start, end) of the daily or weekly period containing now; end is exclusive"""
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == ChallengePeriod.WEEKLY:
+            start -= timedelta(days=start.weekday())
+            return start, start + timedelta(weeks=1)
+        return start, start + timedelta(days=1)
+
+    async def generate_challenges(self, now: Optional[datetime] = None) -> int:
+        """Generate the challenge sets for the current day and week; returns how many were new.
+
+        Every challenge is upserted on (title, period, start_date) with
+        $setOnInsert, so running this any number of times per period
+        leaves exactly one set.
+        """
+        now = now or datetime.now()
+        await self.ensure_indexes()
+
+        operations = []
+        for period, challenges in (
+            (ChallengePeriod.DAILY, self._create_daily_challenges()),
+            (ChallengePeriod.WEEKLY, self._create_weekly_challenges())
+        ):
+            start, end = self.period_bounds(period, now)
+            for challenge in challenges:
+                challenge.start_date, challenge.end_date = start, end
+                operations.append(UpdateOne(
+                    {"title": challenge.title, "period": period.value, "start_date": start},
+                    {"$setOnInsert": challenge.to_dict()},
+                    upsert=True
+                ))
+
+        result = await self.challenges_collection.bulk_write(operations, ordered=False)
+        if result.upserted_count:
+            self.invalidate_catalog()
+        return result.upserted_count
+
+    def _cached_catalog(self, now: datetime) -> Optional[List[Challenge]]:
+        if self._catalog_loaded_at is None or time.monotonic() - self._catalog_loaded_at > self.CATALOG_TTL_SECONDS:
+            return None
+        if any(entry["valid_until"] <= now for entry in self._catalog.values()):
+            return None
+        return [challenge for entry in self._catalog.values() for challenge in entry["challenges"]]
+
+    async def _load_catalog(self, now: datetime) -> List[Challenge]:
+        """Load every unexpired challenge once and cache it per period"""
+        await self.ensure_indexes()
+        loaded_at = time.monotonic()
+        catalog: Dict[str, Dict] = {}
+        async for data in self.challenges_collection.find({"end_date": {"$gt": now}}, {"_id": 0}):
+            challenge = Challenge.from_dict(data)
+            entry = catalog.setdefault(challenge.period.value, {
+                "challenges": [], "valid_until": challenge.end_date
+            })
+            entry["challenges"].append(challenge)
+            # The period's catalog is stale as soon as its first challenge expires
+            entry["valid_until"] = min(entry["valid_until"], challenge.end_date)
+        self._catalog, self._catalog_loaded_at = catalog, loaded_at
+        return [challenge for entry in catalog.values() for challenge in entry["challenges"]]
+
+    async def _accepted_titles(self, user_id: str) -> set:
+        await self.ensure_indexes()
+        cursor = self.user_challenges_collection.find(
+            {"user_id": user_id, "completed_at": None},
+            {"_id": 0, "challenge.title": 1}
+        )
+        return {c["challenge"]["title"] async for c in cursor}
 
     async def get_available_challenges(self, user_id: str) -> List[Challenge]:
         """Get available challenges for a user"""
         now = datetime.now()
-        challenges = await self.challenges_collection.find({
-            "end_date": {"$gt": now}
-        }).to_list(length=None)
-        
+        challenges = self._cached_catalog(now)
+        if challenges is None:
+            challenges, accepted_titles = await asyncio.gather(
+                self._load_catalog(now), self._accepted_titles(user_id)
+            )
+        else:
+            accepted_titles = await self._accepted_titles(user_id)
+
         # Filter out challenges the user has already accepted
-        accepted_challenges = await self.user_challenges_collection.find({
-            "user_id": user_id,
-            "completed_at": None
-        }).to_list(length=None)
-        
-        accepted_ids = [c["challenge"]["title"] for c in accepted_challenges]
-        return [Challenge.from_dict(c) for c in challenges if c["title"] not in accepted_ids]
+        return [c for c in challenges if c.title not in accepted_titles]
 
     async def accept_challenge(self, user_id: str, challenge_title: str) -> Optional[UserChallenge]:
         """Accept a challenge for a user"""
-        challenge_data = await self.challenges_collection.find_one({"title": challenge_title})
+        # Titles repeat every period; take the current instance
+        challenge_data = await self.challenges_collection.find_one(
+            {"title": challenge_title, "end_date": {"$gt": datetime.now()}},
+            sort=[("start_date", DESCENDING)]
+        )
         if not challenge_data:
             return None
 
         challenge = Challenge.from_dict(challenge_data)
         user_challenge = UserChallenge(user_id, challenge)
-        await self.user_challenges_collection.insert_one(user_challenge.to_dict())
+        result = await self.user_challenges_collection.insert_one(user_challenge.to_dict())
+
+        entry = self._routes.get(user_id)
+        if entry is not None:
+            self._add_route(entry, result.inserted_id, user_challenge.progress, challenge.end_date)
         return user_challenge
 
+    @staticmethod
+    def _add_route(entry: Dict, challenge_id, progress: Dict, end_date: Optional[datetime]):
+        for activity_type in progress:
+            entry["types"].setdefault(activity_type, set()).add(challenge_id)
+        if end_date is not None and (entry["valid_until"] is None or end_date < entry["valid_until"]):
+            entry["valid_until"] = end_date
+
+    def invalidate_routes(self, user_id: str):
+        self._routes.pop(user_id, None)
+
+    async def _get_routes(self, user_id: str, now: datetime) -> Dict:
+        """Activity-type routing entry for a user's active challenges, loaded on a miss.
+
+        An entry is reloaded once any of its challenges has ended or it is older
+        than ROUTE_TTL_SECONDS.
+        """
+        entry = self._routes.get(user_id)
+        if entry is not None:
+            expired = entry["valid_until"] is not None and entry["valid_until"] <= now
+            if not expired and time.monotonic() - entry["loaded_at"] <= self.ROUTE_TTL_SECONDS:
+                self._routes.move_to_end(user_id)
+                return entry
+
+        await self.ensure_indexes()
+        entry = {"types": {}, "valid_until": None, "loaded_at": time.monotonic()}
+        cursor = self.user_challenges_collection.find(
+            {
+                "user_id": user_id,
+                "completed_at": None,
+                "$or": [{"challenge.end_date": {"$gt": now}}, {"challenge.end_date": None}]
+            },
+            {"progress": 1, "challenge.end_date": 1}
+        )
+        async for data in cursor:
+            self._add_route(entry, data["_id"], data.get("progress", {}), data.get("challenge", {}).get("end_date"))
+
+        self._routes[user_id] = entry
+        self._routes.move_to_end(user_id)
+        while len(self._routes) > self.MAX_ROUTED_USERS:
+            self._routes.popitem(last=False)
+        return entry
+
+    # Sort order of the user challenge listings, newest completion first
+    LISTING_SORT = [("completed_at", DESCENDING), ("_id", DESCENDING)]
+
+    SUMMARY_PROJECTION = {
+        "progress": 1, "accepted_at": 1, "completed_at": 1,
+        "challenge.title": 1, "challenge.icon": 1, "challenge.period": 1,
+        "challenge.xp_reward": 1, "challenge.end_date": 1, "challenge.requirements": 1
+    }
+
+    @staticmethod
+    def _summary(data: Dict) -> Dict:
+        challenge = data.get("challenge") or {}
+        return {
+            "id": str(data["_id"]),
+            "title": challenge.get("title"),
+            "icon": challenge.get("icon", "🎯"),
+            "period": challenge.get("period"),
+            "xp_reward": challenge.get("xp_reward", 0),
+            "progress": data.get("progress", {}),
+            "targets": {req["type"]: req["target"] for req in challenge.get("requirements", [])},
+            "accepted_at": data.get("accepted_at"),
+            "completed_at": data.get("completed_at"),
+            "end_date": challenge.get("end_date")
+        }
+
+    @staticmethod
+    def _status_filter(user_id: str, completed: bool) -> Dict:
+        return {"user_id": user_id, "completed_at": {"$ne": None} if completed else None}
+
+    async def list_user_challenges(self, user_id: str, completed: bool, limit: int,
+                                   after: Optional[Dict] = None) -> tuple:
+        """One page of a user's active or completed challenges as summaries.
+
+        Sorted newest first on (completed_at, _id), keyset-paginated: `after`
+        is the decoded cursor of the previous page. Returns (summaries, next_cursor).
+        """
+        await self.ensure_indexes()
+        sort = self.LISTING_SORT
+        query = self._status_filter(user_id, completed)
+        if after:
+            query = {"$and": [query, keyset_filter(sort, after)]}
+
+        # Fetch one extra document to know whether another page exists
+        cursor = self.user_challenges_collection.find(query, self.SUMMARY_PROJECTION).sort(sort).limit(limit + 1)
+        page = await cursor.to_list(length=None)
+        next_cursor = encode_cursor(cursor_values(page[limit - 1], sort)) if len(page) > limit else None
+        return [self._summary(data) for data in page[:limit]], next_cursor
+
+    async def count_user_challenges(self, user_id: str, completed: bool) -> int:
+        await self.ensure_indexes()
+        return await self.user_challenges_collection.count_documents(self._status_filter(user_id, completed))
+
+    @staticmethod
+    def _requirements_met_expr() -> Dict:
+        """$expr that is true when no requirement is still below its target"""
+        progress_for_type = {"$ifNull": [{"$arrayElemAt": [{"$map": {
+            "input": {"$filter": {
+                "input": {"$objectToArray": "$progress"},
+                "as": "entry",
+                "cond": {"$eq": ["$$entry.k", "$$req.type"]}
+            }},
+            "as": "entry",
+            "in": "$$entry.v"
+        }}, 0]}, 0]}
+        return {"$eq": [{"$size": {"$filter": {
+            "input": "$challenge.requirements",
+            "as": "req",
+            "cond": {"$lt": [progress_for_type, "$$req.target"]}
+        }}}, 0]}
+
     async def update_challenge_progress(self, user_id: str, activity_type: str, amount: int = 1):
-        """Update progress for all active challenges based on an activity"""
-        active_challenges = await self.user_challenges_collection.find({
+        """Update progress for all active challenges based on an activity.
+
+        Activities routed to none of the user's active challenges return without
+        touching the database, as long as the routing entry is recent enough
+        (ROUTE_MISS_TTL_SECONDS) to include challenges accepted on other workers.
+        Otherwise one ordered bulk_write: an UpdateMany that $incs
+        progress.<activity_type> on every active challenge tracking it, then one
+        that stamps completed_at on those whose requirements are now all met.
+        The writes select challenges by query rather than by the routed ids, so
+        a challenge the entry does not know about yet still gets its progress.
+        """
+        if activity_type not in {t.value for t in ChallengeType}:
+            return
+
+        now = datetime.now()
+        entry = await self._get_routes(user_id, now)
+        if not entry["types"].get(activity_type) and time.monotonic() - entry["loaded_at"] > self.ROUTE_MISS_TTL_SECONDS:
+            self.invalidate_routes(user_id)
+            entry = await self._get_routes(user_id, now)
+        challenge_ids = entry["types"].get(activity_type)
+        if not challenge_ids:
+            return
+
+        active = {
             "user_id": user_id,
-            "completed_at": None
-        }).to_list(length=None)
-
-        for challenge_data in active_challenges:
-            challenge = UserChallenge.from_dict(challenge_data)
-            if activity_type in challenge.progress:
-                challenge.progress[activity_type] += amount
-                
-                # Check if challenge is completed
-                all_completed = all(
-                    challenge.progress.get(req.type.value, 0) >= req.target
-                    for req in challenge.challenge.requirements
-                )
-                
-                if all_completed:
-                    challenge.completed_at = datetime.now()
-                
-                await self.user_challenges_collection.update_one(
-                    {"_id": challenge_data["_id"]},
-                    {"$set": challenge.to_dict()}
-                )
+            "completed_at": None,
+            f"progress.{activity_type}": {"$exists": True},
+            "$or": [{"challenge.end_date": {"$gt": now}}, {"challenge.end_date": None}]
+        }
+        result = await self.user_challenges_collection.bulk_write([
+            UpdateMany(active, {"$inc": {f"progress.{activity_type}": amount}}),
+            UpdateMany(
+                {**active, "$expr": self._requirements_met_expr()},
+                {"$set": {"completed_at": datetime.now()}}
+            )
+        ], ordered=True)
+
+        # Exactly one match per routed challenge means none completed and none disappeared;
+        # anything else changes the user's active set, so rebuild the route next time
+        if result.matched_count != len(challenge_ids):
+            self.invalidate_routes(user_id)
+
+class ChallengeScheduler:
+    """Generates the daily and weekly challenge sets at every period boundary.
+
+    `run` never returns; it belongs in a long-lived process such as
+    scripts/database/run_challenge_jobs.py, not on a request's event loop.
+    Generation is idempotent, so more than one scheduler running still
+    produces one set per period.
+    """
+
+    def __init__(self, challenge_system: ChallengeSystem, delay_seconds: int = 5):
+        self.system = challenge_system
+        # Small offset past midnight so clocks that are slightly behind still land in the new period
+        self.delay = timedelta(seconds=delay_seconds)
+
+    async def run(self):
+        while True:
+            try:
+                created = await self.system.generate_challenges()
+                if created:
+                    logger.info(f"Generated {created} challenges")
+            except Exception as e:
+                logger.error(f"Error generating challenges: {str(e)}")
+
+            now = datetime.now()
+            _, next_day = ChallengeSystem.period_bounds(ChallengePeriod.DAILY, now)
+            await asyncio.sleep((next_day + self.delay - now).total_seconds())
+
+class ChallengeArchiver:
+    """Moves finished user challenges out of the hot collection.
+
+    User challenges completed, or abandoned past their challenge's end_date,
+    more than `retention_days` ago are copied into `user_challenges_archive`
+    as compact summaries and then deleted from `user_challenges`. Each batch
+    is upserted by _id before the delete, so an interrupted run is safe to
+    repeat. `run` archives every `interval_seconds` and, like the scheduler,
+    belongs in a long-lived process (scripts/database/run_challenge_jobs.py).
+    """
+
+    def __init__(self, challenge_system: ChallengeSystem, retention_days: int = 30,
+                 interval_seconds: int = 3600, batch_size: int = 1000):
+        self.system = challenge_system
+        self.archive_collection = challenge_system.db.user_challenges_archive
+        self.retention = timedelta(days=retention_days)
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _summary(data: Dict, archived_at: datetime) -> Dict:
+        challenge = data.get("challenge") or {}
+        return {
+            "_id": data["_id"],
+            "user_id": data["user_id"],
+            "title": challenge.get("title"),
+            "period": challenge.get("period"),
+            "xp_reward": challenge.get("xp_reward", 0),
+            "status": "completed" if data.get("completed_at") else "expired",
+            "progress": data.get("progress", {}),
+            "accepted_at": data.get("accepted_at"),
+            "completed_at": data.get("completed_at"),
+            "end_date": challenge.get("end_date"),
+            "archived_at": archived_at
+        }
+
+    async def archive_once(self, now: Optional[datetime] = None) -> int:
+        """Archive everything past the retention window; returns how many were moved"""
+        now = now or datetime.now()
+        cutoff = now - self.retention
+        await self.system.ensure_indexes()
+        query = {"$or": [
+            {"completed_at": {"$lt": cutoff}},
+            {"completed_at": None, "challenge.end_date": {"$lt": cutoff}}
+        ]}
+        projection = {
+            "user_id": 1, "progress": 1, "accepted_at": 1, "completed_at": 1,
+            "challenge.title": 1, "challenge.period": 1, "challenge.xp_reward": 1, "challenge.end_date": 1
+        }
+
+        moved = 0
+        while True:
+            batch = await self.system.user_challenges_collection.find(query, projection).limit(self.batch_size).to_list(length=None)
+            if not batch:
+                return moved
+            await self.archive_collection.bulk_write([
+                ReplaceOne({"_id": data["_id"]}, self._summary(data, now), upsert=True)
+                for data in batch
+            ], ordered=False)
+            result = await self.system.user_challenges_collection.delete_many(
+                {"_id": {"$in": [data["_id"] for data in batch]}}
+            )
+            moved += result.deleted_count
+
+    async def run(self):
+        while True:
+            try:
+                moved = await self.archive_once()
+                if moved:
+                    logger.info(f"Archived {moved} user challenges")
+            except Exception as e:
+                logger.error(f"Error archiving user challenges: {str(e)}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import List, Dict, Optional
+from pymongo import ReturnDocument
+
+from app.gamification.challenges import ChallengeType
+
+logger = logging.getLogger(__name__)
+
+class CohortChallengeSystem:
+    """Class-wide goals ("the AI batch logs 1,000 study hours this week").
+
+    A cohort challenge's running total is spread over `shard_count` counter
+    documents in `cohort_challenge_counters`; each increment `$inc`s one
+    shard picked at random, so concurrent contributors do not contend on a
+    single document. Reads sum the shards and cache the result for
+    `total_cache_seconds`. The challenge is completed exactly once, by the
+    first increment or read whose fresh sum is at or above the target.
+    """
+
+    def __init__(self, db, shard_count: int = 16, total_cache_seconds: float = 5):
+        self.db = db
+        self.challenges_collection = db.cohort_challenges
+        self.counters_collection = db.cohort_challenge_counters
+        self.shard_count = shard_count
+        self.total_cache_seconds = total_cache_seconds
+        self._totals: Dict = {}   # challenge _id -> (expires_at, total)
+        self._indexed = False
+
+    async def ensure_indexes(self):
+        if self._indexed:
+            return
+        self._indexed = True
+        await asyncio.gather(
+            self.counters_collection.create_index([("challenge_id", 1), ("shard", 1)], unique=True),
+            self.challenges_collection.create_index([("cohort", 1), ("metric", 1), ("end_date", 1)])
+        )
+
+    async def create_challenge(
+        self,
+        cohort: str,
+        title: str,
+        description: str,
+        metric: ChallengeType,
+        target: int,
+        end_date: datetime,
+        xp_reward: int = 0,
+        start_date: Optional[datetime] = None
+    ):
+        """Create a cohort challenge; returns its _id"""
+        await self.ensure_indexes()
+        result = await self.challenges_collection.insert_one({
+            "cohort": cohort,
+            "title": title,
+            "description": description,
+            "metric": metric.value,
+            "target": target,
+            "xp_reward": xp_reward,
+            "shard_count": self.shard_count,
+            "start_date": start_date or datetime.now(),
+            "end_date": end_date,
+            "completed_at": None
+        })
+        return result.inserted_id
+
+    async def get_active_challenges(self, cohort: str, metric: Optional[str] = None) -> List[Dict]:
+        query = {"cohort": cohort, "end_date": {"$gt": datetime.now()}}
+        if metric:
+            query["metric"] = metric
+        return await self.challenges_collection.find(query).to_list(length=None)
+
+    async def _sum_shards(self, challenge: Dict) -> int:
+        challenge_id = challenge["_id"]
+        totals = await self.counters_collection.aggregate([
+            {"$match": {"challenge_id": challenge_id}},
+            {"$group": {"_id": None, "total": {"$sum": "$count"}}}
+        ]).to_list(length=1)
+        total = totals[0]["total"] if totals else 0
+        self._totals[challenge_id] = (time.monotonic() + self.total_cache_seconds, total)
+        return total
+
+    async def get_total(self, challenge: Dict) -> int:
+        """Summed total, cached briefly; a fresh sum past the target completes the challenge"""
+        cached = self._totals.get(challenge["_id"])
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        total = await self._sum_shards(challenge)
+        await self._claim_completion(challenge, total)
+        return total
+
+    async def _claim_completion(self, challenge: Dict, total: int) -> bool:
+        """Mark the challenge completed if the total reached the target; only one caller ever wins"""
+        if challenge.get("completed_at") or total < challenge["target"]:
+            return False
+        completed = await self.challenges_collection.find_one_and_update(
+            {"_id": challenge["_id"], "completed_at": None},
+            {"$set": {"completed_at": datetime.now(), "completed_total": total}},
+            return_document=ReturnDocument.AFTER
+        )
+        if completed is None:
+            return False
+        challenge.update(completed)
+        logger.info(f"Cohort challenge '{challenge['title']}' for {challenge['cohort']} completed with {total}")
+        return True
+
+    async def increment(self, challenge: Dict, amount: int = 1) -> bool:
+        """Add to a challenge's total; returns True if this call completed the challenge.
+
+        Increments from other workers reach this worker's cached total when it
+        is next refreshed, so a crossing made elsewhere is detected by the
+        first increment or read after at most `total_cache_seconds`.
+        """
+        await self.ensure_indexes()
+        challenge_id = challenge["_id"]
+        shard = random.randrange(challenge.get("shard_count", self.shard_count))
+        await self.counters_collection.update_one(
+            {"challenge_id": challenge_id, "shard": shard},
+            {"$inc": {"count": amount}},
+            upsert=True
+        )
+        if challenge.get("completed_at"):
+            return False
+
+        cached = self._totals.get(challenge_id)
+        if cached is None or cached[0] <= time.monotonic():
+            return await self._claim_completion(challenge, await self._sum_shards(challenge))
+
+        # Fold our own write into the cached total so a crossing made here is seen immediately,
+        # then confirm it against the shards before claiming
+        self._totals[challenge_id] = (cached[0], cached[1] + amount)
+        if cached[1] + amount < challenge["target"]:
+            return False
+        return await self._claim_completion(challenge, await self._sum_shards(challenge))
+
+    async def record_activity(self, cohort: str, activity_type: str, amount: int = 1) -> List[Dict]:
+        """Credit an activity to the cohort's matching challenges; returns the ones it completed"""
+        if not cohort:
+            return []
+        challenges = await self.get_active_challenges(cohort, activity_type)
+        results = await asyncio.gather(*(self.increment(c, amount) for c in challenges))
+        return [c for c, completed in zip(challenges, results) if completed]
+
+    async def get_progress(self, challenge: Dict) -> Dict:
+        total = await self.get_total(challenge)
+        return {
+            "id": str(challenge["_id"]),
+            "cohort": challenge["cohort"],
+            "title": challenge["title"],
+            "description": challenge["description"],
+            "metric": challenge["metric"],
+            "target": challenge["target"],
+            "total": total,
+            "percentage": min(100, total / challenge["target"] * 100) if challenge["target"] else 100,
+            "end_date": challenge["end_date"],
+            "completed_at": challenge.get("completed_at")
+        }
@@ -0,0 +1,11 @@
+def department_cohorts(user_manager):
+    """Cohort lookup: maps a list of user ids to {user_id: department on their profile}.
+
+    Ids are matched against the SQLite users table, so non-numeric ids have
+    no cohort. Profiles come through UserManager's batched profile cache.
+    """
+    def lookup(user_ids):
+        ids = {int(user_id): user_id for user_id in user_ids if str(user_id).isdigit()}
+        profiles = user_manager.get_user_profiles(list(ids))
+        return {ids[user_id]: profile['profile'].get('department') for user_id, profile in profiles.items()}
+    return lookup
@@ -0,0 +1,212 @@
+import asyncio
+import atexit
+import logging
+import threading
+from datetime import datetime
+from pymongo import UpdateOne
+
+from app.gamification.achievements import Achievement, UserProgress
+from app.gamification.background import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion buffer is at capacity and the caller should retry later"""
+    pass
+
+class ActivityIngestor:
+    """In-process queue that coalesces activity events per user before writing.
+
+    `submit` only folds the event into the pending aggregate for its user and
+    returns. A flusher running on a dedicated BackgroundLoop (started once by
+    `start`, not tied to any request) writes the buffer `flush_interval_ms`
+    after it stops being empty, turning each user's aggregate into a single
+    `$inc`-style update pipeline and sending the whole batch with one
+    `bulk_write(ordered=False)`. Failed flushes are retried with backoff.
+    """
+
+    MAX_RETRY_SECONDS = 5
+
+    def __init__(self, gamification_system, flush_interval_ms=50, max_pending_events=50000, background=None):
+        self.system = gamification_system
+        self.collection = gamification_system.progress_collection
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending_events = max_pending_events
+        self.background = background or BackgroundLoop('activity-ingestor')
+
+        # Request threads submit while the background loop flushes
+        self._lock = threading.Lock()
+        self._pending = {}        # user_id -> {"xp", "increments", "study_sessions", "counts"}
+        self._pending_events = 0
+        self._events = []         # raw (user_id, type, additional_data, occurred_at) for the activity log
+        self._wakeup = asyncio.Event()
+        self._runner = None       # the flusher task, on the background loop
+        self._flushing = False
+        self._started = False
+        self._closed = False
+
+    @property
+    def pending_events(self):
+        return self._pending_events
+
+    def submit(self, user_id, activity_type, additional_data=None):
+        """Queue an activity; raises IngestionQueueFull when the buffer is saturated"""
+        if self._closed:
+            raise RuntimeError("ActivityIngestor is closed")
+        if not self._started:
+            raise RuntimeError("ActivityIngestor is not started")
+
+        xp, increments = UserProgress.activity_increments(activity_type, additional_data)
+        with self._lock:
+            if self._pending_events >= self.max_pending_events:
+                raise IngestionQueueFull(f"{self._pending_events} events pending")
+            was_empty = not self._pending
+            aggregate = self._pending.setdefault(str(user_id), {"xp": 0, "increments": {}, "study_sessions": 0, "counts": {}})
+            aggregate["xp"] += xp
+            aggregate["counts"][activity_type] = aggregate["counts"].get(activity_type, 0) + 1
+            for stat, amount in increments.items():
+                aggregate["increments"][stat] = aggregate["increments"].get(stat, 0) + amount
+            aggregate["study_sessions"] += increments.get("study_sessions", 0)
+            self._pending_events += 1
+            if self.system.activity_log is not None:
+                self._events.append((str(user_id), activity_type, additional_data, datetime.now()))
+
+        # Only the first event of a batch needs to wake the flusher
+        if was_empty:
+            self.background.call_soon(self._wakeup.set)
+
+    def start(self):
+        """Start the flusher on the background loop; call once at app startup"""
+        if self._started:
+            return
+        self.background.start()
+        self.background.submit(self._run())
+        self._started = True
+        atexit.register(self.close)
+
+    async def _run(self):
+        self._runner = asyncio.current_task()
+        failures = 0
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            delay = self.flush_interval if not failures else min(self.flush_interval * 2 ** failures, self.MAX_RETRY_SECONDS)
+            await asyncio.sleep(delay)
+            self._flushing = True
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.error(f"Error flushing activity events (attempt {failures}): {str(e)}")
+            finally:
+                self._flushing = False
+            if self._pending:
+                self._wakeup.set()
+
+    def _requeue(self, batch, events, log_events):
+        with self._lock:
+            self._events = log_events + self._events
+            for user_id, aggregate in batch.items():
+                pending = self._pending.setdefault(user_id, {"xp": 0, "increments": {}, "study_sessions": 0, "counts": {}})
+                pending["xp"] += aggregate["xp"]
+                for activity, count in aggregate["counts"].items():
+                    pending["counts"][activity] = pending["counts"].get(activity, 0) + count
+                pending["study_sessions"] += aggregate["study_sessions"]
+                for stat, amount in aggregate["increments"].items():
+                    pending["increments"][stat] = pending["increments"].get(stat, 0) + amount
+            self._pending_events += events
+
+    async def flush(self):
+        """Write every pending aggregate in one unordered bulk_write; returns the events flushed"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            events, self._pending_events = self._pending_events, 0
+            log_events, self._events = self._events, []
+
+        now = datetime.now()
+        cohorts = self.system._cohorts(list(batch))
+        operations = [
+            UpdateOne(
+                {"user_id": user_id},
+                self.system._activity_pipeline(
+                    user_id, aggregate["xp"], aggregate["increments"], now,
+                    aggregate["study_sessions"], aggregate["counts"], cohorts.get(str(user_id))
+                ),
+                upsert=True
+            )
+            for user_id, aggregate in batch.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BaseException:
+            # Includes cancellation, so a flush interrupted by close() is not lost
+            self._requeue(batch, events, log_events)
+            raise
+        self.system.cache.invalidate(*batch)
+
+        try:
+            await self.system._log_activities(log_events)
+        except Exception as e:
+            # Progress is already written and the unordered log writes may have partly applied, so do not retry
+            logger.error(f"Error appending {len(log_events)} events to the activity log: {str(e)}")
+        await self._after_flush(batch)
+        return events
+
+    async def _after_flush(self, batch):
+        """Sync the leaderboard and re-check achievements for the users that need it.
+
+        Everything is read back with a single `$in` query; achievements are only
+        re-evaluated for users whose achievement-relevant stats moved.
+        """
+        track_xp = self.system.leaderboard is not None
+        users = [
+            user_id for user_id, aggregate in batch.items()
+            if (track_xp and aggregate["xp"])
+            or any(stat in Achievement.STAT_INDEX for stat in aggregate["increments"])
+        ]
+        if not users:
+            return
+
+        checks = []
+        async for progress_data in self.collection.find({"user_id": {"$in": users}}):
+            progress = UserProgress.from_dict(progress_data)
+            progress.changed_stats.update(batch[progress_data["user_id"]]["increments"])
+            self.system._sync_leaderboard(progress, progress_data.get("previous_cohort"))
+            checks.append(self.system.check_achievements(progress))
+        await asyncio.gather(*checks)
+
+    async def _drain(self, attempts=3):
+        runner = self._runner
+        if runner is not None and not runner.done():
+            # A flush already in flight is allowed to finish; an idle flusher is just cancelled
+            if not self._flushing:
+                runner.cancel()
+            self._wakeup.set()
+            await asyncio.gather(runner, return_exceptions=True)
+        for _ in range(attempts):
+            if not self._pending:
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing activity events at shutdown: {str(e)}")
+
+    def close(self, timeout=10):
+        """Stop accepting events, flush everything still buffered and stop the background loop.
+
+        Safe to call more than once; registered with atexit by `start`.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._started and self.background.running:
+            try:
+                self.background.submit(self._drain()).result(timeout)
+            except Exception as e:
+                logger.error(f"Error closing the activity ingestor: {str(e)}")
+            self.background.stop()
+        if self._pending_events:
+            logger.error(f"Lost {self._pending_events} activity events at shutdown")
@@ -0,0 +1,163 @@
+from bisect import bisect_left, insort
+
+class InMemorySortedSet:
+    """Stand-in for the subset of the redis-py sorted-set API the leaderboard uses.
+
+    Each key keeps a member -> score dict plus a list of (-score, member)
+    tuples kept sorted with bisect, so rank lookups are O(log n). Ties are
+    broken by member name, ascending.
+    """
+
+    def __init__(self):
+        self._scores = {}
+        self._order = {}
+
+    def _remove(self, key, member):
+        score = self._scores[key].pop(member)
+        order = self._order[key]
+        del order[bisect_left(order, (-score, member))]
+
+    def _insert(self, key, member, score):
+        self._scores.setdefault(key, {})[member] = score
+        insort(self._order.setdefault(key, []), (-score, member))
+
+    def zadd(self, key, mapping):
+        added = 0
+        for member, score in mapping.items():
+            if member in self._scores.get(key, {}):
+                self._remove(key, member)
+            else:
+                added += 1
+            self._insert(key, member, score)
+        return added
+
+    def zincrby(self, key, amount, member):
+        score = self._scores.get(key, {}).get(member, 0)
+        if member in self._scores.get(key, {}):
+            self._remove(key, member)
+        self._insert(key, member, score + amount)
+        return score + amount
+
+    def zrem(self, key, *members):
+        removed = 0
+        for member in members:
+            if member in self._scores.get(key, {}):
+                self._remove(key, member)
+                removed += 1
+        return removed
+
+    def zscore(self, key, member):
+        return self._scores.get(key, {}).get(member)
+
+    def zrevrank(self, key, member):
+        score = self.zscore(key, member)
+        if score is None:
+            return None
+        return bisect_left(self._order[key], (-score, member))
+
+    def zrevrange(self, key, start, end, withscores=False):
+        order = self._order.get(key, [])
+        stop = len(order) if end == -1 else end + 1
+        entries = order[max(start, 0):stop]
+        if withscores:
+            return [(member, -neg_score) for neg_score, member in entries]
+        return [member for _, member in entries]
+
+    def zcard(self, key):
+        return len(self._scores.get(key, {}))
+
+    def pipeline(self):
+        # Commands apply immediately, so the "pipeline" is the set itself
+        return self
+
+    def execute(self):
+        return []
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+class Leaderboard:
+    """XP leaderboard backed by sorted sets: one global set plus one per cohort.
+
+    Works against a redis.Redis client or an InMemorySortedSet; every query is
+    a rank lookup or a range read, so top-k, "my rank" and "neighbours around
+    me" are all O(log n + k).
+    """
+
+    KEY_PREFIX = 'leaderboard:xp'
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else InMemorySortedSet()
+
+    def _keys(self, cohort=None):
+        keys = [self.KEY_PREFIX]
+        if cohort:
+            keys.append(self._key(cohort))
+        return keys
+
+    def _key(self, cohort=None):
+        return f'{self.KEY_PREFIX}:{cohort}' if cohort else self.KEY_PREFIX
+
+    def set_xp(self, user_id, xp, cohort=None, previous_cohort=None):
+        """Record a user's absolute XP (idempotent).
+
+        A `previous_cohort` other than `cohort` is the set the user is moving
+        out of; they are removed from it in the same pipeline.
+        """
+        pipe = self.backend.pipeline()
+        for key in self._keys(cohort):
+            pipe.zadd(key, {str(user_id): xp})
+        if previous_cohort and previous_cohort != cohort:
+            pipe.zrem(self._key(previous_cohort), str(user_id))
+        pipe.execute()
+
+    def set_many(self, entries):
+        """Record absolute XP for many (user_id, xp, cohort) entries, one zadd per sorted set"""
+        mappings = {}
+        for user_id, xp, cohort in entries:
+            for key in self._keys(cohort):
+                mappings.setdefault(key, {})[str(user_id)] = xp
+        for key, mapping in mappings.items():
+            self.backend.zadd(key, mapping)
+
+    def add_xp(self, user_id, points, cohort=None):
+        for key in self._keys(cohort):
+            self.backend.zincrby(key, points, str(user_id))
+
+    def _entries(self, key, start, end):
+        return [
+            {'rank': start + offset + 1, 'user_id': _decode(member), 'xp': int(score)}
+            for offset, (member, score) in enumerate(
+                self.backend.zrevrange(key, start, end, withscores=True)
+            )
+        ]
+
+    def top(self, k=10, cohort=None):
+        return self._entries(self._key(cohort), 0, k - 1)
+
+    def rank(self, user_id, cohort=None):
+        key = self._key(cohort)
+        position = self.backend.zrevrank(key, str(user_id))
+        if position is None:
+            return None
+        return {
+            'rank': position + 1,
+            'user_id': str(user_id),
+            'xp': int(self.backend.zscore(key, str(user_id))),
+            'total': self.backend.zcard(key)
+        }
+
+    def around(self, user_id, radius=5, cohort=None):
+        key = self._key(cohort)
+        position = self.backend.zrevrank(key, str(user_id))
+        if position is None:
+            return []
+        start = max(0, position - radius)
+        return self._entries(key, start, position + radius)
+
+def create_leaderboard(redis_url=None):
+    """Leaderboard on Redis when a URL is configured, in memory otherwise"""
+    if not redis_url:
+        return Leaderboard()
+    import redis
+    return Leaderboard(redis.Redis.from_url(redis_url, decode_responses=True))
@@ -0,0 +1,80 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+class ProgressCache:
+    """Bounded LRU cache of stored progress documents with a per-entry TTL.
+
+    Entries are private copies: put() copies the document in and get()
+    hands out a fresh copy, so the UserProgress objects callers hydrate
+    from them (and mutate) never share state with the cache or each other.
+    GamificationSystem writes through it: every write that knows the new
+    document state replaces the entry, every write that does not drops it.
+    The TTL bounds how long a copy can lag behind writes made by other
+    worker processes. Every stored write bumps the document's `version`,
+    so put() ignores a document older than the live entry it would
+    replace: a slow request cannot overwrite a newer copy with its own.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=60):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # user_id -> (expires_at, document)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_puts = 0
+
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, user_id, document):
+        key = str(user_id)
+        document = copy.deepcopy(document)
+        now = time.monotonic()
+        with self._lock:
+            current = self._entries.get(key)
+            if (current is not None and current[0] > now
+                    and current[1].get('version', 0) > document.get('version', 0)):
+                self.stale_puts += 1
+                return False
+            self._entries[key] = (now + self.ttl, document)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'stale_puts': self.stale_puts,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
@@ -1,15 +1,51 @@
-from flask import Blueprint, jsonify, request, current_app
-from models.gamification import GamificationSystem
+from flask import Blueprint, jsonify, request
+from app.gamification.achievements import GamificationSystem
+from app.gamification.ingestion import ActivityIngestor, IngestionQueueFull
+from app.gamification.leaderboard import create_leaderboard
+from app.gamification.activity_log import ActivityLog
+from app.gamification.progress_cache import ProgressCache
+from app.gamification.cohorts import department_cohorts
+from backend.core.user_management import UserManager
 from utils.auth import login_required
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 gamification = Blueprint('gamification', __name__)
 gamification_system = None
+activity_ingestor = None
+
+def _log_leaderboard_load(future):
+    try:
+        logger.info(f"Leaderboard loaded with {future.result()} users")
+    except Exception as e:
+        logger.error(f"Error loading the leaderboard: {str(e)}")
+
+@gamification.record_once
+def initialize_gamification(state):
+    """Runs when the blueprint is registered, so the ingestor's flusher starts with the app.
 
-@gamification.before_app_first_request
-def initialize_gamification():
-    global gamification_system
-    gamification_system = GamificationSystem(current_app.config['MONGO_DB'])
+    The leaderboard is filled from user_progress in the background; ranks
+    are partial until that finishes.
+    """
+    global gamification_system, activity_ingestor
+    config = state.app.config
+    gamification_system = GamificationSystem(
+        config['MONGO_DB'],
+        leaderboard=create_leaderboard(config.get('LEADERBOARD_REDIS_URL')),
+        activity_log=ActivityLog(config['MONGO_DB']),
+        cache=ProgressCache(
+            config.get('PROGRESS_CACHE_SIZE', 10000),
+            config.get('PROGRESS_CACHE_TTL', 60)
+        ),
+        cohort_lookup=department_cohorts(UserManager())
+    )
+    activity_ingestor = ActivityIngestor(gamification_system)
+    activity_ingestor.start()
+    activity_ingestor.background.submit(gamification_system.load_leaderboard()).add_done_callback(
+        _log_leaderboard_load
+    )
 
 @gamification.route('/api/progress', methods=['GET'])
 @login_required
@@ -19,6 +55,12 @@ async def get_progress():
     await gamification_system.check_achievements(progress)
     return jsonify(progress.to_dict())
 
+@gamification.route('/api/progress/cache-stats', methods=['GET'])
+@login_required
+async def get_progress_cache_stats():
+    """Hit rate and occupancy of this worker's progress cache"""
+    return jsonify(gamification_system.cache.stats())
+
 @gamification.route('/api/achievements', methods=['GET'])
 @login_required
 async def get_achievements():
@@ -45,10 +87,7 @@ async def get_achievements():
 @login_required
 async def record_daily_login():
     user_id = request.user_id
-    progress = await gamification_system.get_user_progress(user_id)
-    progress.update_login_streak()
-    await gamification_system.update_user_progress(progress)
-    await gamification_system.check_achievements(progress)
+    progress = await gamification_system.record_daily_login(user_id)
     
     return jsonify({
         'success': True,
@@ -67,12 +106,7 @@ async def record_activity():
     if not activity_type:
         return jsonify({'success': False, 'error': 'Activity type is required'}), 400
     
-    progress = await gamification_system.get_user_progress(user_id)
-    old_level = progress.level
-    
-    progress.record_activity(activity_type, additional_data)
-    await gamification_system.update_user_progress(progress)
-    await gamification_system.check_achievements(progress)
+    progress, old_level = await gamification_system.record_activity(user_id, activity_type, additional_data)
     
     response_data = {
         'success': True,
@@ -87,11 +121,34 @@ async def record_activity():
         response_data['level_up'] = {
             'old_level': old_level,
             'new_level': progress.level,
-            'xp_for_next': (progress.level + 1) ** 2 * 25
+            'xp_for_next': progress.xp_for_level(progress.level + 1)
         }
     
     return jsonify(response_data)
 
+@gamification.route('/api/activity-events', methods=['POST'])
+@login_required
+async def ingest_activity_events():
+    """Queue one or more activity events; totals are applied in the background"""
+    user_id = request.user_id
+    payload = request.json
+    events = payload.get('events', [payload]) if isinstance(payload, dict) else payload
+    
+    if not events or any(not event.get('type') for event in events):
+        return jsonify({'success': False, 'error': 'Activity type is required'}), 400
+    
+    accepted = 0
+    try:
+        for event in events:
+            activity_ingestor.submit(user_id, event['type'], event.get('additional_data', {}))
+            accepted += 1
+    except IngestionQueueFull:
+        response = jsonify({'success': False, 'error': 'Too many pending events', 'accepted': accepted})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    
+    return jsonify({'success': True, 'accepted': accepted}), 202
+
 @gamification.route('/api/study-session', methods=['POST'])
 @login_required
 async def record_study_session():
@@ -99,13 +156,67 @@ async def record_study_session():
     session_data = request.json
     duration = session_data.get('duration', 0)  # duration in minutes
     
-    progress = await gamification_system.get_user_progress(user_id)
-    progress.record_activity('study_session', {'duration': duration})
-    await gamification_system.update_user_progress(progress)
-    await gamification_system.check_achievements(progress)
+    progress, _ = await gamification_system.record_activity(user_id, 'study_session', {'duration': duration})
     
     return jsonify({
         'success': True,
         'stats': progress.stats,
         'study_streak': (datetime.now() - progress.study_streak_start).days + 1 if progress.study_streak_start else 0
     })
+
+@gamification.route('/api/leaderboard', methods=['GET'])
+@login_required
+async def get_leaderboard():
+    """Top-k users by XP, globally or within a cohort"""
+    k = min(request.args.get('k', 10, type=int), 100)
+    cohort = request.args.get('cohort')
+    return jsonify({
+        'cohort': cohort,
+        'leaders': gamification_system.leaderboard.top(k, cohort)
+    })
+
+@gamification.route('/api/leaderboard/me', methods=['GET'])
+@login_required
+async def get_my_rank():
+    user_id = request.user_id
+    cohort = request.args.get('cohort')
+    rank = gamification_system.leaderboard.rank(user_id, cohort)
+    if rank is None:
+        return jsonify({'success': False, 'error': 'No XP recorded yet'}), 404
+    return jsonify(rank)
+
+@gamification.route('/api/leaderboard/around', methods=['GET'])
+@login_required
+async def get_leaderboard_neighbors():
+    """Users ranked just above and below the current user"""
+    user_id = request.user_id
+    radius = min(request.args.get('radius', 5, type=int), 50)
+    cohort = request.args.get('cohort')
+    return jsonify({
+        'cohort': cohort,
+        'neighbors': gamification_system.leaderboard.around(user_id, radius, cohort)
+    })
+
+@gamification.route('/api/activity/heatmap', methods=['GET'])
+@login_required
+async def get_activity_heatmap():
+    """Per-day event counts and study minutes for the last N days"""
+    user_id = request.user_id
+    days = max(1, min(request.args.get('days', 90, type=int), 366))
+    return jsonify({
+        'days': await gamification_system.activity_log.get_heatmap(user_id, days)
+    })
+
+@gamification.route('/api/activity/streak', methods=['GET'])
+@login_required
+async def get_activity_streak():
+    user_id = request.user_id
+    return jsonify({
+        'streak': await gamification_system.activity_log.get_streak(user_id)
+    })
+
+@gamification.route('/api/activity/weekly', methods=['GET'])
+@login_required
+async def get_weekly_summary():
+    user_id = request.user_id
+    return jsonify(await gamification_system.activity_log.get_weekly_summary(user_id))
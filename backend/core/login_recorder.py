@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+import atexit
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class LoginRecorder:
+    """Write-behind buffer for last_login timestamps and login_history rows.
+
+    Logins only append to in-memory buffers; a background thread flushes them
+    in one batched transaction every `flush_interval_ms` or as soon as
+    `max_events` events are pending, and once more on shutdown. After a
+    failed flush it backs off exponentially (up to MAX_RETRY_SECONDS), and
+    at most `max_pending` history rows are kept for retry; the oldest are
+    dropped beyond that.
+    """
+
+    MAX_RETRY_SECONDS = 30
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, db_path):
+        """Return the shared recorder for a database file"""
+        with cls._instances_lock:
+            recorder = cls._instances.get(db_path)
+            if recorder is None or recorder._closed:
+                recorder = cls._instances[db_path] = cls(db_path)
+            return recorder
+
+    def __init__(self, db_path, flush_interval_ms=500, max_events=200, max_pending=10000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_events = max_events
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._failures = 0      # consecutive failed flushes
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._last_logins = {}  # user_id -> latest login timestamp (coalesced)
+        self._history = []      # pending login_history rows
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='login-recorder', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _timestamp():
+        # Same format SQLite uses for CURRENT_TIMESTAMP
+        return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+    def record(self, user_id, success=True, failure_reason=None, ip_address=None, user_agent=None):
+        """Buffer a login attempt; never touches the database on the caller's thread"""
+        timestamp = self._timestamp()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("LoginRecorder is closed")
+            if success:
+                self._last_logins[user_id] = timestamp
+            self._history.append((user_id, timestamp, ip_address, user_agent, success, failure_reason))
+            self._trim()
+            # While the database is failing the flusher keeps its backoff instead
+            if len(self._history) >= self.max_events and not self._failures:
+                self._wakeup.notify()
+
+    def _trim(self):
+        # Caller holds the lock
+        excess = len(self._history) - self.max_pending
+        if excess > 0:
+            del self._history[:excess]
+            self.dropped += excess
+
+    def _drain(self):
+        with self._lock:
+            last_logins, self._last_logins = self._last_logins, {}
+            history, self._history = self._history, []
+        return last_logins, history
+
+    def flush(self):
+        """Write all pending events in a single transaction"""
+        last_logins, history = self._drain()
+        if not last_logins and not history:
+            return 0
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany('''
+                UPDATE users
+                SET last_login = ?
+                WHERE user_id = ?
+                ''', [(ts, user_id) for user_id, ts in last_logins.items()])
+
+                conn.executemany('''
+                INSERT INTO login_history
+                    (user_id, login_timestamp, ip_address, user_agent, success, failure_reason)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', history)
+        except sqlite3.Error:
+            # Put the events back so the next flush retries them
+            with self._lock:
+                for user_id, ts in last_logins.items():
+                    self._last_logins.setdefault(user_id, ts)
+                self._history[:0] = history
+                self._trim()
+            raise
+        finally:
+            conn.close()
+        return len(history)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._closed:
+                    if self._failures:
+                        # Always wait after a failed flush, however many events are pending
+                        self._wakeup.wait(min(self.flush_interval * 2 ** self._failures, self.MAX_RETRY_SECONDS))
+                    elif len(self._history) < self.max_events:
+                        self._wakeup.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+                self._failures = 0
+            except sqlite3.Error:
+                self._failures += 1
+                logger.exception(f"Error flushing login events (attempt {self._failures}, "
+                                 f"{len(self._history)} pending, {self.dropped} dropped)")
+            if closed:
+                return
+
+    def close(self):
+        """Stop the background thread after a final flush"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
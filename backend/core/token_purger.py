@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+import atexit
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TokenPurger:
+    """Background job that deletes expired or used password reset tokens.
+
+    Rows are removed in batches of `batch_size`, each in its own short
+    transaction, so the purge never holds the write lock for long and the
+    token table and its indexes stay sized to the live tokens.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, db_path):
+        """Return the shared purger for a database file"""
+        with cls._instances_lock:
+            purger = cls._instances.get(db_path)
+            if purger is None or purger._stopped.is_set():
+                purger = cls._instances[db_path] = cls(db_path)
+            return purger
+
+    def __init__(self, db_path, interval_seconds=3600, batch_size=500):
+        self.db_path = db_path
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='token-purger', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _delete_in_batches(self, conn, where):
+        total = 0
+        while True:
+            with conn:
+                cursor = conn.execute(f'''
+                DELETE FROM password_reset_tokens
+                WHERE token_id IN (
+                    SELECT token_id FROM password_reset_tokens
+                    WHERE {where}
+                    LIMIT ?
+                )
+                ''', (self.batch_size,))
+            total += cursor.rowcount
+            if cursor.rowcount < self.batch_size:
+                return total
+
+    def purge(self):
+        """Delete expired and used tokens; returns the number of rows removed"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Each predicate is served by its own index (see create_user_database)
+            removed = self._delete_in_batches(conn, "expires_at <= datetime('now')")
+            removed += self._delete_in_batches(conn, "is_used")
+            return removed
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.purge()
+            except sqlite3.Error:
+                logger.exception("Error purging password reset tokens")
+
+    def stop(self):
+        self._stopped.set()
@@ -1,18 +1,82 @@
 import sqlite3
+import hashlib
+import secrets
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
-from ..database.database import DB_PATH
+import copy
+import time
+import threading
+from collections import OrderedDict
+from ..database.database import DB_PATH, SQLITE_MAX_VARIABLES
 from .database_manager import DatabaseManager
+from .login_recorder import LoginRecorder
+from .token_purger import TokenPurger
+
+PROFILE_FIELDS = [
+    'first_name', 'last_name', 'phone_number', 'date_of_birth', 'address',
+    'city', 'state', 'country', 'profile_picture_url', 'bio', 'department', 'position'
+]
 
 class UserManager:
+    # Shared across instances so every manager sees the same roles and invalidations
+    _roles = {}           # db_path -> {role_name: role_id}
+    _profile_cache = {}   # db_path -> OrderedDict(user_id -> (expires_at, profile))
+    # Request threads share the cache; every read or write of it holds this lock
+    _profile_lock = threading.Lock()
+    PROFILE_CACHE_SIZE = 1024
+    # Invalidation only reaches this process, so edits made by other workers show up within the TTL
+    PROFILE_CACHE_TTL = 60
+
     def __init__(self):
         self.db_path = DB_PATH
         self.db_manager = DatabaseManager()
+        self.login_recorder = LoginRecorder.for_database(self.db_path)
+        self.token_purger = TokenPurger.for_database(self.db_path)
 
     def _get_connection(self):
         return sqlite3.connect(self.db_path)
 
+    def _get_roles(self, refresh=False):
+        """Role name -> role_id map, loaded from the roles table once"""
+        roles = UserManager._roles.get(self.db_path)
+        if roles is None or refresh:
+            conn = self._get_connection()
+            try:
+                roles = dict(conn.execute('SELECT role_name, role_id FROM roles').fetchall())
+            finally:
+                conn.close()
+            UserManager._roles[self.db_path] = roles
+        return roles
+
+    def _get_role_id(self, role_name):
+        role_id = self._get_roles().get(role_name)
+        if role_id is None:
+            # The role may have been added after the map was loaded
+            role_id = self._get_roles(refresh=True).get(role_name)
+        return role_id
+
+    def _get_role_name(self, role_id):
+        for name, rid in self._get_roles().items():
+            if rid == role_id:
+                return name
+        return None
+
+    def _cache(self):
+        return UserManager._profile_cache.setdefault(self.db_path, OrderedDict())
+
+    def _cache_profile(self, user_id, profile):
+        with UserManager._profile_lock:
+            cache = self._cache()
+            cache[user_id] = (time.monotonic() + self.PROFILE_CACHE_TTL, profile)
+            cache.move_to_end(user_id)
+            while len(cache) > self.PROFILE_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    def invalidate_profile(self, user_id):
+        with UserManager._profile_lock:
+            self._cache().pop(user_id, None)
+
     def _hash_password(self, password, salt=None):
         if salt is None:
             salt = secrets.token_hex(16)
@@ -24,6 +88,11 @@ class UserManager:
         )
         return salt, hash_obj.hex()
 
+    @staticmethod
+    def _token_digest(token):
+        # Only the fixed-length digest is stored, never the raw token
+        return hashlib.sha256(token.encode()).hexdigest()
+
     def _validate_email(self, email):
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return re.match(pattern, email) is not None
@@ -61,11 +130,9 @@ class UserManager:
 
         try:
             # Get role_id
-            cursor.execute('SELECT role_id FROM roles WHERE role_name = ?', (role_name,))
-            result = cursor.fetchone()
-            if not result:
+            role_id = self._get_role_id(role_name)
+            if role_id is None:
                 raise ValueError(f"Invalid role: {role_name}")
-            role_id = result[0]
 
             # Hash password
             salt, password_hash = self._hash_password(password)
@@ -107,7 +174,7 @@ class UserManager:
         finally:
             conn.close()
 
-    def authenticate_user(self, username, password):
+    def authenticate_user(self, username, password, ip_address=None, user_agent=None):
         conn = self._get_connection()
         cursor = conn.cursor()
 
@@ -123,78 +190,86 @@ class UserManager:
                 return None, "Invalid username"
 
             user_id, stored_hash, salt, is_active, email_verified = result
-
-            if not is_active:
-                return None, "Account is deactivated"
-
-            if not email_verified:
-                return None, "Email not verified"
-
-            # Verify password
-            _, password_hash = self._hash_password(password, salt)
-            
-            if password_hash != stored_hash:
-                return None, "Invalid password"
-
-            # Update last login
-            cursor.execute('''
-            UPDATE users
-            SET last_login = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-            ''', (user_id,))
-
-            conn.commit()
-            return user_id, "Success"
-
         finally:
             conn.close()
 
-    def get_user_profile(self, user_id):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute('''
-            SELECT u.username, u.email, u.role_id, r.role_name,
-                   p.first_name, p.last_name, p.phone_number,
-                   p.date_of_birth, p.address, p.city, p.state,
-                   p.country, p.profile_picture_url, p.bio,
-                   p.department, p.position
-            FROM users u
-            JOIN roles r ON u.role_id = r.role_id
-            JOIN user_profiles p ON u.user_id = p.user_id
-            WHERE u.user_id = ?
-            ''', (user_id,))
-            
-            result = cursor.fetchone()
-            if not result:
-                return None
+        if not is_active:
+            reason = "Account is deactivated"
+        elif not email_verified:
+            reason = "Email not verified"
+        elif self._hash_password(password, salt)[1] != stored_hash:
+            reason = "Invalid password"
+        else:
+            reason = None
+
+        # last_login and login_history are written behind, off the login path
+        self.login_recorder.record(
+            user_id,
+            success=reason is None,
+            failure_reason=reason,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
 
-            return {
-                'username': result[0],
-                'email': result[1],
-                'role': {
-                    'id': result[2],
-                    'name': result[3]
-                },
-                'profile': {
-                    'first_name': result[4],
-                    'last_name': result[5],
-                    'phone_number': result[6],
-                    'date_of_birth': result[7],
-                    'address': result[8],
-                    'city': result[9],
-                    'state': result[10],
-                    'country': result[11],
-                    'profile_picture_url': result[12],
-                    'bio': result[13],
-                    'department': result[14],
-                    'position': result[15]
-                }
-            }
+        if reason:
+            return None, reason
+        return user_id, "Success"
+
+    def _row_to_profile(self, row):
+        username, email, role_id = row[1], row[2], row[3]
+        return {
+            'username': username,
+            'email': email,
+            'role': {
+                'id': role_id,
+                'name': self._get_role_name(role_id)
+            },
+            'profile': dict(zip(PROFILE_FIELDS, row[4:]))
+        }
+
+    def get_user_profiles(self, user_ids):
+        """Fetch many profiles at once; cache misses are loaded with one IN query per 900 ids.
+
+        Returned profiles are copies, so callers may modify them freely.
+        """
+        profiles = {}
+        missing = []
+        now = time.monotonic()
+        with UserManager._profile_lock:
+            cache = self._cache()
+            for user_id in dict.fromkeys(user_ids):
+                entry = cache.get(user_id)
+                if entry is not None and entry[0] > now:
+                    cache.move_to_end(user_id)
+                    profiles[user_id] = copy.deepcopy(entry[1])
+                else:
+                    if entry is not None:
+                        del cache[user_id]
+                    missing.append(user_id)
+
+        if missing:
+            fields = ', '.join(f'p.{field}' for field in PROFILE_FIELDS)
+            conn = self._get_connection()
+            try:
+                for i in range(0, len(missing), SQLITE_MAX_VARIABLES):
+                    chunk = missing[i:i + SQLITE_MAX_VARIABLES]
+                    cursor = conn.execute(f'''
+                    SELECT u.user_id, u.username, u.email, u.role_id, {fields}
+                    FROM users u
+                    JOIN user_profiles p ON u.user_id = p.user_id
+                    WHERE u.user_id IN ({','.join('?' * len(chunk))})
+                    ''', chunk)
+                    for row in cursor.fetchall():
+                        profile = self._row_to_profile(row)
+                        self._cache_profile(row[0], profile)
+                        profiles[row[0]] = copy.deepcopy(profile)
+            finally:
+                conn.close()
+
+        return profiles
 
-        finally:
-            conn.close()
+    def get_user_profile(self, user_id):
+        return self.get_user_profiles([user_id]).get(user_id)
 
     def update_profile(self, user_id, **profile_data):
         conn = self._get_connection()
@@ -212,6 +287,7 @@ class UserManager:
             ''', values)
 
             conn.commit()
+            self.invalidate_profile(user_id)
             return cursor.rowcount > 0
 
         finally:
@@ -230,12 +306,12 @@ class UserManager:
 
             user_id = result[0]
             token = secrets.token_urlsafe(32)
-            expires_at = datetime.now() + timedelta(hours=24)
+            expires_at = datetime.utcnow() + timedelta(hours=24)
 
             cursor.execute('''
             INSERT INTO password_reset_tokens (user_id, token, expires_at)
             VALUES (?, ?, ?)
-            ''', (user_id, token, expires_at))
+            ''', (user_id, self._token_digest(token), expires_at.strftime('%Y-%m-%d %H:%M:%S')))
 
             conn.commit()
             return token
@@ -254,23 +330,23 @@ class UserManager:
         cursor = conn.cursor()
 
         try:
-            # Get token info
+            # Get token info; expiry is compared in SQL against the UTC clock
             cursor.execute('''
-            SELECT user_id, expires_at, is_used
+            SELECT token_id, user_id, is_used, expires_at <= datetime('now')
             FROM password_reset_tokens
             WHERE token = ?
-            ''', (token,))
+            ''', (self._token_digest(token),))
             
             result = cursor.fetchone()
             if not result:
                 return False, "Invalid token"
 
-            user_id, expires_at, is_used = result
+            token_id, user_id, is_used, expired = result
             
             if is_used:
                 return False, "Token already used"
                 
-            if datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S') < datetime.now():
+            if expired:
                 return False, "Token expired"
 
             # Update password
@@ -286,11 +362,15 @@ class UserManager:
             cursor.execute('''
             UPDATE password_reset_tokens
             SET is_used = true
-            WHERE token = ?
-            ''', (token,))
+            WHERE token_id = ?
+            ''', (token_id,))
 
             conn.commit()
             return True, "Password reset successful"
 
         finally:
             conn.close()
+
+    def purge_password_reset_tokens(self):
+        """Delete expired and used reset tokens now instead of waiting for the background job"""
+        return self.token_purger.purge()
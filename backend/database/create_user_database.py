@@ -57,7 +57,7 @@ def create_user_database():
     )
     ''')
 
-    # Create PasswordResetTokens table
+    # Create PasswordResetTokens table (token holds the SHA-256 hex digest)
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS password_reset_tokens (
         token_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -70,6 +70,16 @@ def create_user_database():
     )
     ''')
 
+    # Indexes used by the expired/used token purge
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_expires_at
+    ON password_reset_tokens (expires_at)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_used
+    ON password_reset_tokens (token_id) WHERE is_used
+    ''')
+
     # Create LoginHistory table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS login_history (
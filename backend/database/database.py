@@ -1,10 +1,15 @@
 import sqlite3
 import os
 
+DB_PATH = 'student_tracking.db'
+
+# SQLite refuses statements with more than 999 bound parameters
+SQLITE_MAX_VARIABLES = 900
+
 def get_db_connection():
     """Create a database connection and return it"""
     try:
-        conn = sqlite3.connect('student_tracking.db')
+        conn = sqlite3.connect(DB_PATH)
         conn.row_factory = sqlite3.Row
         return conn
     except sqlite3.Error as e:
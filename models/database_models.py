@@ -50,4 +50,18 @@ class NotificationModel:
             "created_at": datetime.utcnow(),
             "read": False
         }
-        return self.collection.insert_one(notification)
\ No newline at end of file
+        return self.collection.insert_one(notification)
+
+    def create_notifications(self, notifications_data):
+        # One insert_many for a whole batch instead of a round trip per notification
+        now = datetime.utcnow()
+        notifications = [{
+            "student_id": ObjectId(data['student_id']),
+            "type": data['type'],
+            "message": data['message'],
+            "created_at": now,
+            "read": False
+        } for data in notifications_data]
+        if not notifications:
+            return None
+        return self.collection.insert_many(notifications, ordered=False)
@@ -1,15 +1,26 @@
-from flask import Blueprint, jsonify, request, current_app
-from models.challenges import ChallengeSystem
+import asyncio
+from flask import Blueprint, jsonify, request
+from app.gamification.challenges import ChallengeSystem
+from app.gamification.cohort_challenges import CohortChallengeSystem
+from app.gamification.cohorts import department_cohorts
+from backend.core.user_management import UserManager
 from utils.auth import login_required
+from utils.pagination import decode_cursor, page_size
 from datetime import datetime
 
 challenges = Blueprint('challenges', __name__)
 challenge_system = None
+cohort_challenge_system = None
+cohort_lookup = None
 
-@challenges.before_app_first_request
-def initialize_challenges():
-    global challenge_system
-    challenge_system = ChallengeSystem(current_app.config['MONGO_DB'])
+@challenges.record_once
+def initialize_challenges(state):
+    """Runs when the blueprint is registered"""
+    global challenge_system, cohort_challenge_system, cohort_lookup
+    config = state.app.config
+    challenge_system = ChallengeSystem(config['MONGO_DB'])
+    cohort_challenge_system = CohortChallengeSystem(config['MONGO_DB'])
+    cohort_lookup = department_cohorts(UserManager())
 
 @challenges.route('/api/challenges', methods=['GET'])
 @login_required
@@ -21,31 +32,41 @@ async def get_challenges():
         'challenges': [challenge.to_dict() for challenge in available_challenges]
     })
 
+async def _challenge_listing(key, completed):
+    """Keyset-paginated summaries of the user's active or completed challenges"""
+    user_id = request.user_id
+    limit = page_size(request.args.get('limit'))
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'], ChallengeSystem.LISTING_SORT)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+    (items, next_cursor), total = await asyncio.gather(
+        challenge_system.list_user_challenges(user_id, completed, limit, after),
+        challenge_system.count_user_challenges(user_id, completed)
+    )
+    return jsonify({
+        key: items,
+        'next_cursor': next_cursor,
+        'total': total
+    })
+
 @challenges.route('/api/challenges/active', methods=['GET'])
 @login_required
 async def get_active_challenges():
     """Get user's active challenges"""
-    user_id = request.user_id
-    active_challenges = await challenge_system.user_challenges_collection.find({
-        'user_id': user_id,
-        'completed_at': None
-    }).to_list(length=None)
-    return jsonify({
-        'active_challenges': active_challenges
-    })
+    return await _challenge_listing('active_challenges', completed=False)
 
 @challenges.route('/api/challenges/completed', methods=['GET'])
 @login_required
 async def get_completed_challenges():
     """Get user's completed challenges"""
-    user_id = request.user_id
-    completed_challenges = await challenge_system.user_challenges_collection.find({
-        'user_id': user_id,
-        'completed_at': {'$ne': None}
-    }).to_list(length=None)
-    return jsonify({
-        'completed_challenges': completed_challenges
-    })
+    return await _challenge_listing('completed_challenges', completed=True)
 
 @challenges.route('/api/challenges/accept', methods=['POST'])
 @login_required
@@ -87,27 +108,52 @@ async def update_challenge_progress():
             'success': False,
             'error': 'Activity type is required'
         }), 400
+    if not isinstance(amount, int) or isinstance(amount, bool) or amount < 1:
+        return jsonify({
+            'success': False,
+            'error': 'Amount must be a positive integer'
+        }), 400
     
+    # The cohort is the user's own department, never one named by the client
+    cohort = cohort_lookup([user_id]).get(user_id)
     await challenge_system.update_challenge_progress(user_id, activity_type, amount)
+    cohort_completed = await cohort_challenge_system.record_activity(cohort, activity_type, amount)
     
-    # Get updated active challenges
-    active_challenges = await challenge_system.user_challenges_collection.find({
-        'user_id': user_id,
-        'completed_at': None
-    }).to_list(length=None)
+    # First page of the updated active challenges
+    active_challenges, next_cursor = await challenge_system.list_user_challenges(user_id, False, page_size(None))
     
     return jsonify({
         'success': True,
-        'active_challenges': active_challenges
+        'active_challenges': active_challenges,
+        'next_cursor': next_cursor,
+        'cohort_challenges_completed': [c['title'] for c in cohort_completed]
     })
 
 @challenges.route('/api/challenges/generate', methods=['POST'])
 @login_required
 async def generate_challenges():
-    """Generate new challenges (admin only)"""
+    """Generate the current period's challenges if missing (admin only)"""
     # TODO: Add admin check
-    await challenge_system.generate_challenges()
+    created = await challenge_system.generate_challenges()
     return jsonify({
         'success': True,
-        'message': 'New challenges generated successfully'
+        'created': created,
+        'message': 'New challenges generated successfully' if created else 'Challenges for this period already exist'
+    })
+
+@challenges.route('/api/challenges/cohort', methods=['GET'])
+@login_required
+async def get_cohort_challenges():
+    """Active class-wide challenges for a cohort with their running totals"""
+    cohort = request.args.get('cohort')
+    if not cohort:
+        return jsonify({
+            'success': False,
+            'error': 'Cohort is required'
+        }), 400
+
+    active = await cohort_challenge_system.get_active_challenges(cohort)
+    return jsonify({
+        'cohort': cohort,
+        'challenges': await asyncio.gather(*(cohort_challenge_system.get_progress(c) for c in active))
     })
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Apply a new or changed achievement rule to every stored user_progress document.
+
+The rule from Achievement.ACHIEVEMENTS is evaluated server-side with a single
+update_many pipeline (see GamificationSystem.backfill_query): users missing
+the achievement get an entry with their current progress, and users whose
+stat already meets the requirement are completed and credited the XP.
+
+Usage: python -m scripts.database.backfill_achievement KEY [KEY ...] [--dry-run]
+"""
+import sys
+import argparse
+from pymongo import MongoClient
+
+from app.config import Config
+from app.gamification.achievements import Achievement, GamificationSystem
+
+def backfill_achievement(db, key, dry_run=False):
+    """Returns (matched, awarded) for one achievement key"""
+    collection = db.user_progress
+    update_filter, award_filter, pipeline = GamificationSystem.backfill_query(key)
+    awarded = collection.count_documents(award_filter)
+    if dry_run:
+        return collection.count_documents(update_filter), awarded
+    return collection.update_many(update_filter, pipeline).matched_count, awarded
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill achievements for all users')
+    parser.add_argument('keys', nargs='+', metavar='KEY', help='Achievement key(s) to backfill')
+    parser.add_argument('--dry-run', action='store_true', help='Count affected users without writing')
+    args = parser.parse_args()
+
+    unknown = [key for key in args.keys if key not in Achievement.ACHIEVEMENTS]
+    if unknown:
+        print(f"Error: unknown achievement(s): {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+
+    client = MongoClient(Config.MONGODB_URI)
+    try:
+        db = client[Config.MONGODB_NAME]
+        for key in args.keys:
+            matched, awarded = backfill_achievement(db, key, args.dry_run)
+            points = Achievement.ACHIEVEMENTS[key]['points']
+            verb = 'would be' if args.dry_run else 'were'
+            print(f"{key}: {matched} users {verb} updated, {awarded} completed (+{awarded * points} XP)")
+        if not args.dry_run:
+            print("Running app workers serve cached progress for up to PROGRESS_CACHE_TTL seconds;")
+            print("leaderboards pick up the awarded XP when the workers next start")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
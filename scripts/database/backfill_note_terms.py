@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Add the `terms` array used for prefix search to notes created before it existed.
+
+Usage: python -m scripts.database.backfill_note_terms [--uri mongodb://localhost:27017/] [--db student_handbook]
+"""
+import sys
+import argparse
+from pymongo import MongoClient, UpdateOne
+
+from services.note_search import note_terms
+
+def backfill_note_terms(collection, batch_size=1000):
+    """Returns the number of notes updated"""
+    updated = 0
+    operations = []
+    for note in collection.find({'terms': {'$exists': False}}, {'title': 1, 'content': 1}):
+        operations.append(UpdateOne(
+            {'_id': note['_id']},
+            {'$set': {'terms': note_terms(note.get('title'), note.get('content'))}}
+        ))
+        if len(operations) == batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+            print(f"{updated} notes updated")
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill search terms for existing notes')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/', help='MongoDB connection URI')
+    parser.add_argument('--db', default='student_handbook', help='Database name')
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    try:
+        print(f"Done: {backfill_note_terms(client[args.db]['notes'])} notes updated")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
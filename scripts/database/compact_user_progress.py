@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Migrate user_progress documents to the compact achievement representation.
+
+Older documents embed the name, description, icon, points and requirement
+of every achievement; these now live only in Achievement.ACHIEVEMENTS and
+are hydrated at read time. The migration runs server-side as a single
+update pipeline per batch of documents, so nothing is round-tripped through
+Python.
+
+Usage: python -m scripts.database.compact_user_progress [--batch-size 5000] [--benchmark]
+"""
+import sys
+import time
+import argparse
+import bson
+from pymongo import MongoClient
+
+from app.config import Config
+from app.gamification.achievements import UserProgress
+
+# Matches documents whose achievements still carry catalog metadata
+LEGACY_FILTER = {'achievements.name': {'$exists': True}}
+
+COMPACT_PIPELINE = [
+    {'$set': {'achievements': {'$map': {
+        'input': '$achievements',
+        'as': 'a',
+        'in': {
+            'key': '$$a.key',
+            'progress': '$$a.progress',
+            'completed': '$$a.completed',
+            'completed_at': '$$a.completed_at'
+        }
+    }}}}
+]
+
+def compact_user_progress(db, batch_size=5000):
+    """Rewrite legacy documents in _id-bounded batches; returns the number migrated"""
+    collection = db.user_progress
+    migrated = 0
+    while True:
+        ids = [doc['_id'] for doc in collection.find(LEGACY_FILTER, {'_id': 1}).limit(batch_size)]
+        if not ids:
+            return migrated
+        result = collection.update_many({'_id': {'$in': ids}}, COMPACT_PIPELINE)
+        migrated += result.modified_count
+        print(f"{migrated} documents compacted")
+
+def benchmark(db, samples=2000):
+    """Compare the BSON size and insert latency of the legacy and compact layouts"""
+    progress = UserProgress('benchmark-user')
+    for achievement in progress.achievements[:2]:
+        achievement.progress = 40
+    legacy = progress.to_dict()
+    compact = progress.to_document()
+
+    scratch = db.benchmark_user_progress
+    results = {}
+    for name, document in (('legacy', legacy), ('compact', compact)):
+        scratch.drop()
+        started = time.perf_counter()
+        for i in range(samples):
+            scratch.replace_one({'user_id': f'user-{i}'}, {**document, 'user_id': f'user-{i}'}, upsert=True)
+        elapsed = time.perf_counter() - started
+        results[name] = (len(bson.encode(document)), elapsed / samples * 1000)
+    scratch.drop()
+
+    for name, (size, latency) in results.items():
+        print(f"{name:>8}: {size:5d} bytes/document, {latency:.3f} ms/write")
+    saved = 1 - results['compact'][0] / results['legacy'][0]
+    print(f"Compact documents are {saved:.0%} smaller")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact achievements stored in user_progress')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Documents per update (default: 5000)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Measure document size and write latency of both layouts instead of migrating')
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGODB_URI)
+    try:
+        db = client[Config.MONGODB_NAME]
+        if args.benchmark:
+            benchmark(db)
+        else:
+            print(f"Compacted {compact_user_progress(db, args.batch_size)} documents")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
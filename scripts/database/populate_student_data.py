@@ -1,10 +1,24 @@
+"""
+Provision student accounts from a roster into the SQLite database.
+
+Run from the repository root as a module so the backend package imports:
+
+Usage: python -m scripts.database.populate_student_data [--roster FILE] [--db PATH] [--workers N] [--output FILE]
+"""
 import sqlite3
 import hashlib
 import secrets
 import random
 import string
+import os
+import csv
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+from backend.database.database import SQLITE_MAX_VARIABLES
+
 def generate_temp_password():
     """Generate a temporary password that's memorable but secure"""
     # Format: Word + 2 digits + Special Character
@@ -26,127 +40,191 @@ def hash_password(password, salt=None):
     )
     return salt, hash_obj.hex()
 
-def create_student(cursor, usn, email, first_name, last_name, department='AI'):
-    """Create a student user with profile"""
-    # Generate temporary password
-    temp_password = generate_temp_password()
-    
-    # Get student role id
+# Default intake used when no roster file is given
+STUDENTS = [
+    # 3rd Year AI Students (22 batch)
+    ('1RV22AI001', 'Aditya', 'Sharma', 'aditya.s@rvce.edu.in'),
+    ('1RV22AI002', 'Bhavana', 'Kumar', 'bhavana.k@rvce.edu.in'),
+    ('1RV22AI003', 'Chetan', 'Patel', 'chetan.p@rvce.edu.in'),
+    ('1RV22AI004', 'Divya', 'Reddy', 'divya.r@rvce.edu.in'),
+    ('1RV22AI005', 'Eshan', 'Gupta', 'eshan.g@rvce.edu.in'),
+    ('1RV22AI006', 'Fathima', 'Khan', 'fathima.k@rvce.edu.in'),
+    ('1RV22AI007', 'Ganesh', 'Iyer', 'ganesh.i@rvce.edu.in'),
+    ('1RV22AI008', 'Harini', 'Nair', 'harini.n@rvce.edu.in'),
+    ('1RV22AI009', 'Ishaan', 'Menon', 'ishaan.m@rvce.edu.in'),
+    ('1RV22AI010', 'Jyoti', 'Singh', 'jyoti.s@rvce.edu.in'),
+    ('1RV22AI011', 'Karthik', 'Raj', 'karthik.r@rvce.edu.in'),
+    ('1RV22AI012', 'Lakshmi', 'Priya', 'lakshmi.p@rvce.edu.in'),
+    ('1RV22AI013', 'Mohan', 'Das', 'mohan.d@rvce.edu.in'),
+    ('1RV22AI014', 'Nandini', 'Shah', 'nandini.s@rvce.edu.in'),
+    ('1RV22AI015', 'Om', 'Prakash', 'om.p@rvce.edu.in'),
+    ('1RV22AI016', 'Priya', 'Verma', 'priya.v@rvce.edu.in'),
+    ('1RV22AI017', 'Qureshi', 'Ahmed', 'qureshi.a@rvce.edu.in'),
+    ('1RV22AI018', 'Rahul', 'Mehta', 'rahul.m@rvce.edu.in'),
+    ('1RV22AI019', 'Sanjana', 'Reddy', 'sanjana.r@rvce.edu.in'),
+    ('1RV22AI020', 'Tanvi', 'Shah', 'tanvi.s@rvce.edu.in'),
+    ('1RV22AI021', 'Uday', 'Kumar', 'uday.k@rvce.edu.in'),
+    ('1RV22AI022', 'Varun', 'Nair', 'varun.n@rvce.edu.in'),
+    ('1RV22AI023', 'Waqar', 'Khan', 'waqar.k@rvce.edu.in'),
+    ('1RV22AI024', 'Xavier', 'Dsouza', 'xavier.d@rvce.edu.in'),
+    ('1RV22AI025', 'Yamini', 'Rao', 'yamini.r@rvce.edu.in'),
+    ('1RV22AI026', 'Zara', 'Patel', 'zara.p@rvce.edu.in'),
+    ('1RV22AI027', 'Abhishek', 'Kumar', 'abhishek.k@rvce.edu.in'),
+    ('1RV22AI028', 'Bhoomika', 'Singh', 'bhoomika.s@rvce.edu.in'),
+    ('1RV22AI029', 'Chirag', 'Verma', 'chirag.v@rvce.edu.in'),
+    ('1RV22AI030', 'Deepika', 'Nair', 'deepika.n@rvce.edu.in'),
+    ('1RV22AI031', 'Eshwar', 'Reddy', 'eshwar.r@rvce.edu.in'),
+    ('1RV22AI032', 'Fatima', 'Syed', 'fatima.s@rvce.edu.in'),
+    ('1RV22AI033', 'Gaurav', 'Sharma', 'gaurav.s@rvce.edu.in'),
+    ('1RV22AI034', 'Hema', 'Patel', 'hema.p@rvce.edu.in'),
+    ('1RV22AI035', 'Irfan', 'Khan', 'irfan.k@rvce.edu.in'),
+    ('1RV22AI036', 'Jasmine', 'Kumar', 'jasmine.k@rvce.edu.in'),
+    ('1RV22AI037', 'Karan', 'Singh', 'karan.s@rvce.edu.in'),
+    ('1RV22AI038', 'Leela', 'Menon', 'leela.m@rvce.edu.in'),
+    ('1RV22AI039', 'Manish', 'Gupta', 'manish.g@rvce.edu.in'),
+    ('1RV22AI040', 'Neha', 'Reddy', 'neha.r@rvce.edu.in'),
+    ('1RV22AI041', 'Omkar', 'Patil', 'omkar.p@rvce.edu.in'),
+    ('1RV22AI042', 'Prachi', 'Shah', 'prachi.s@rvce.edu.in'),
+    ('1RV22AI043', 'Rahul', 'Verma', 'rahul.v@rvce.edu.in'),
+    ('1RV22AI044', 'Sneha', 'Kumar', 'sneha.k@rvce.edu.in'),
+    ('1RV22AI045', 'Tarun', 'Nair', 'tarun.n@rvce.edu.in'),
+    ('1RV22AI046', 'Uma', 'Sharma', 'uma.s@rvce.edu.in'),
+    ('1RV22AI047', 'Vivek', 'Patel', 'vivek.p@rvce.edu.in'),
+    ('1RV22AI048', 'Wasim', 'Khan', 'wasim.k@rvce.edu.in'),
+    ('1RV22AI049', 'Xena', 'Dsouza', 'xena.d@rvce.edu.in'),
+    ('1RV22AI050', 'Yogesh', 'Rao', 'yogesh.r@rvce.edu.in'),
+    ('1RV22AI051', 'Zain', 'Malik', 'zain.m@rvce.edu.in'),
+    ('1RV22AI052', 'Ananya', 'Kumar', 'ananya.k@rvce.edu.in'),
+    ('1RV22AI053', 'Brijesh', 'Patel', 'brijesh.p@rvce.edu.in'),
+    ('1RV22AI054', 'Chandni', 'Shah', 'chandni.s@rvce.edu.in'),
+    ('1RV22AI055', 'Dhruv', 'Verma', 'dhruv.v@rvce.edu.in'),
+    ('1RV22AI056', 'Ekta', 'Singh', 'ekta.s@rvce.edu.in'),
+    ('1RV22AI057', 'Farhan', 'Khan', 'farhan.k@rvce.edu.in'),
+    ('1RV22AI058', 'Gitika', 'Reddy', 'gitika.r@rvce.edu.in'),
+    ('1RV22AI059', 'Harsh', 'Kumar', 'harsh.k@rvce.edu.in'),
+    ('1RV22AI060', 'Ishita', 'Sharma', 'ishita.s@rvce.edu.in')
+]
+
+def load_roster(path):
+    """Load (usn, first_name, last_name, email, department) rows from a CSV or NDJSON roster"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8') as f:
+        if ext in ('.ndjson', '.jsonl'):
+            records = [json.loads(line) for line in f if line.strip()]
+        elif ext == '.csv':
+            records = list(csv.DictReader(f))
+        else:
+            raise ValueError(f"Unsupported roster format: {ext} (expected .csv or .ndjson)")
+
+    roster = []
+    for line_no, record in enumerate(records, start=1):
+        missing = [k for k in ('usn', 'first_name', 'last_name', 'email') if not record.get(k)]
+        if missing:
+            raise ValueError(f"Roster entry {line_no} is missing: {', '.join(missing)}")
+        roster.append((
+            record['usn'].strip(),
+            record['first_name'].strip(),
+            record['last_name'].strip(),
+            record['email'].strip(),
+            (record.get('department') or 'AI').strip()
+        ))
+    return roster
+
+def _chunks(items, size=SQLITE_MAX_VARIABLES):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _existing_accounts(cursor, usns, emails):
+    """Return the usernames and emails from the roster that are already taken"""
+    taken = set()
+    for chunk in _chunks(usns):
+        cursor.execute(
+            f"SELECT username FROM users WHERE username IN ({','.join('?' * len(chunk))})", chunk
+        )
+        taken.update(row[0] for row in cursor.fetchall())
+    for chunk in _chunks(emails):
+        cursor.execute(
+            f"SELECT email FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk
+        )
+        taken.update(row[0] for row in cursor.fetchall())
+    return taken
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords in parallel across all cores (PBKDF2 is CPU bound)"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < workers * 4:
+        return [hash_password(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+def provision_students(conn, roster, workers=None):
+    """Create student users and profiles in bulk within a single transaction"""
+    cursor = conn.cursor()
+
+    # Get student role id once for the whole intake
     cursor.execute('SELECT role_id FROM roles WHERE role_name = ?', ('student',))
     role_id = cursor.fetchone()[0]
 
-    # Hash password
-    salt, password_hash = hash_password(temp_password)
+    # Drop duplicates within the roster and accounts that already exist
+    taken = _existing_accounts(cursor, [r[0] for r in roster], [r[3] for r in roster])
+    students = []
+    for usn, first_name, last_name, email, department in roster:
+        if usn in taken or email in taken:
+            print(f"Error creating user {usn}: username or email already exists")
+            continue
+        taken.update((usn, email))
+        students.append((usn, first_name, last_name, email, department))
 
-    # Create user
-    try:
-        cursor.execute('''
+    if not students:
+        return []
+
+    passwords = [generate_temp_password() for _ in students]
+    hashes = hash_passwords(passwords, workers)
+
+    with conn:
+        cursor.executemany('''
         INSERT INTO users (username, email, password_hash, salt, role_id, email_verified)
         VALUES (?, ?, ?, ?, ?, ?)
-        ''', (usn, email, password_hash, salt, role_id, True))
-        
-        user_id = cursor.lastrowid
+        ''', [
+            (usn, email, password_hash, salt, role_id, True)
+            for (usn, _, _, email, _), (salt, password_hash) in zip(students, hashes)
+        ])
+
+        user_ids = {}
+        usns = [s[0] for s in students]
+        for chunk in _chunks(usns):
+            cursor.execute(
+                f"SELECT username, user_id FROM users WHERE username IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            user_ids.update(cursor.fetchall())
 
-        # Create user profile
-        cursor.execute('''
+        cursor.executemany('''
         INSERT INTO user_profiles (user_id, first_name, last_name, department)
         VALUES (?, ?, ?, ?)
-        ''', (user_id, first_name, last_name, department))
+        ''', [
+            (user_ids[usn], first_name, last_name, department)
+            for usn, first_name, last_name, _, department in students
+        ])
 
-        return usn, temp_password
-    except sqlite3.IntegrityError as e:
-        print(f"Error creating user {usn}: {e}")
-        return None, None
+    return [(s[0], password) for s, password in zip(students, passwords)]
 
-def populate_student_data():
+def populate_student_data(db_path='student_tracking.db', roster_path=None, workers=None):
     """Populate the database with student data"""
-    conn = sqlite3.connect('student_tracking.db')
-    cursor = conn.cursor()
+    if roster_path:
+        roster = load_roster(roster_path)
+    else:
+        roster = [(usn, first, last, email, 'AI') for usn, first, last, email in STUDENTS]
 
-    # Complete list of students
-    students = [
-        # 3rd Year AI Students (22 batch)
-        ('1RV22AI001', 'Aditya', 'Sharma', 'aditya.s@rvce.edu.in'),
-        ('1RV22AI002', 'Bhavana', 'Kumar', 'bhavana.k@rvce.edu.in'),
-        ('1RV22AI003', 'Chetan', 'Patel', 'chetan.p@rvce.edu.in'),
-        ('1RV22AI004', 'Divya', 'Reddy', 'divya.r@rvce.edu.in'),
-        ('1RV22AI005', 'Eshan', 'Gupta', 'eshan.g@rvce.edu.in'),
-        ('1RV22AI006', 'Fathima', 'Khan', 'fathima.k@rvce.edu.in'),
-        ('1RV22AI007', 'Ganesh', 'Iyer', 'ganesh.i@rvce.edu.in'),
-        ('1RV22AI008', 'Harini', 'Nair', 'harini.n@rvce.edu.in'),
-        ('1RV22AI009', 'Ishaan', 'Menon', 'ishaan.m@rvce.edu.in'),
-        ('1RV22AI010', 'Jyoti', 'Singh', 'jyoti.s@rvce.edu.in'),
-        ('1RV22AI011', 'Karthik', 'Raj', 'karthik.r@rvce.edu.in'),
-        ('1RV22AI012', 'Lakshmi', 'Priya', 'lakshmi.p@rvce.edu.in'),
-        ('1RV22AI013', 'Mohan', 'Das', 'mohan.d@rvce.edu.in'),
-        ('1RV22AI014', 'Nandini', 'Shah', 'nandini.s@rvce.edu.in'),
-        ('1RV22AI015', 'Om', 'Prakash', 'om.p@rvce.edu.in'),
-        ('1RV22AI016', 'Priya', 'Verma', 'priya.v@rvce.edu.in'),
-        ('1RV22AI017', 'Qureshi', 'Ahmed', 'qureshi.a@rvce.edu.in'),
-        ('1RV22AI018', 'Rahul', 'Mehta', 'rahul.m@rvce.edu.in'),
-        ('1RV22AI019', 'Sanjana', 'Reddy', 'sanjana.r@rvce.edu.in'),
-        ('1RV22AI020', 'Tanvi', 'Shah', 'tanvi.s@rvce.edu.in'),
-        ('1RV22AI021', 'Uday', 'Kumar', 'uday.k@rvce.edu.in'),
-        ('1RV22AI022', 'Varun', 'Nair', 'varun.n@rvce.edu.in'),
-        ('1RV22AI023', 'Waqar', 'Khan', 'waqar.k@rvce.edu.in'),
-        ('1RV22AI024', 'Xavier', 'Dsouza', 'xavier.d@rvce.edu.in'),
-        ('1RV22AI025', 'Yamini', 'Rao', 'yamini.r@rvce.edu.in'),
-        ('1RV22AI026', 'Zara', 'Patel', 'zara.p@rvce.edu.in'),
-        ('1RV22AI027', 'Abhishek', 'Kumar', 'abhishek.k@rvce.edu.in'),
-        ('1RV22AI028', 'Bhoomika', 'Singh', 'bhoomika.s@rvce.edu.in'),
-        ('1RV22AI029', 'Chirag', 'Verma', 'chirag.v@rvce.edu.in'),
-        ('1RV22AI030', 'Deepika', 'Nair', 'deepika.n@rvce.edu.in'),
-        ('1RV22AI031', 'Eshwar', 'Reddy', 'eshwar.r@rvce.edu.in'),
-        ('1RV22AI032', 'Fatima', 'Syed', 'fatima.s@rvce.edu.in'),
-        ('1RV22AI033', 'Gaurav', 'Sharma', 'gaurav.s@rvce.edu.in'),
-        ('1RV22AI034', 'Hema', 'Patel', 'hema.p@rvce.edu.in'),
-        ('1RV22AI035', 'Irfan', 'Khan', 'irfan.k@rvce.edu.in'),
-        ('1RV22AI036', 'Jasmine', 'Kumar', 'jasmine.k@rvce.edu.in'),
-        ('1RV22AI037', 'Karan', 'Singh', 'karan.s@rvce.edu.in'),
-        ('1RV22AI038', 'Leela', 'Menon', 'leela.m@rvce.edu.in'),
-        ('1RV22AI039', 'Manish', 'Gupta', 'manish.g@rvce.edu.in'),
-        ('1RV22AI040', 'Neha', 'Reddy', 'neha.r@rvce.edu.in'),
-        ('1RV22AI041', 'Omkar', 'Patil', 'omkar.p@rvce.edu.in'),
-        ('1RV22AI042', 'Prachi', 'Shah', 'prachi.s@rvce.edu.in'),
-        ('1RV22AI043', 'Rahul', 'Verma', 'rahul.v@rvce.edu.in'),
-        ('1RV22AI044', 'Sneha', 'Kumar', 'sneha.k@rvce.edu.in'),
-        ('1RV22AI045', 'Tarun', 'Nair', 'tarun.n@rvce.edu.in'),
-        ('1RV22AI046', 'Uma', 'Sharma', 'uma.s@rvce.edu.in'),
-        ('1RV22AI047', 'Vivek', 'Patel', 'vivek.p@rvce.edu.in'),
-        ('1RV22AI048', 'Wasim', 'Khan', 'wasim.k@rvce.edu.in'),
-        ('1RV22AI049', 'Xena', 'Dsouza', 'xena.d@rvce.edu.in'),
-        ('1RV22AI050', 'Yogesh', 'Rao', 'yogesh.r@rvce.edu.in'),
-        ('1RV22AI051', 'Zain', 'Malik', 'zain.m@rvce.edu.in'),
-        ('1RV22AI052', 'Ananya', 'Kumar', 'ananya.k@rvce.edu.in'),
-        ('1RV22AI053', 'Brijesh', 'Patel', 'brijesh.p@rvce.edu.in'),
-        ('1RV22AI054', 'Chandni', 'Shah', 'chandni.s@rvce.edu.in'),
-        ('1RV22AI055', 'Dhruv', 'Verma', 'dhruv.v@rvce.edu.in'),
-        ('1RV22AI056', 'Ekta', 'Singh', 'ekta.s@rvce.edu.in'),
-        ('1RV22AI057', 'Farhan', 'Khan', 'farhan.k@rvce.edu.in'),
-        ('1RV22AI058', 'Gitika', 'Reddy', 'gitika.r@rvce.edu.in'),
-        ('1RV22AI059', 'Harsh', 'Kumar', 'harsh.k@rvce.edu.in'),
-        ('1RV22AI060', 'Ishita', 'Sharma', 'ishita.s@rvce.edu.in')
-    ]
-
-    # Store credentials for return
-    credentials = []
-
-    # Create students
-    for usn, first_name, last_name, email in students:
-        username, password = create_student(cursor, usn, email, first_name, last_name)
-        if username and password:
-            credentials.append((username, password))
-
-    conn.commit()
-    conn.close()
-    return credentials
+    conn = sqlite3.connect(db_path)
+    try:
+        return provision_students(conn, roster, workers)
+    finally:
+        conn.close()
 
-if __name__ == "__main__":
-    print("Creating student accounts...")
-    credentials = populate_student_data()
-    
-    # Save credentials to a file
-    with open('student_credentials.txt', 'w') as f:
+def write_credentials(credentials, path='student_credentials.txt'):
+    with open(path, 'w') as f:
         f.write("Student Credentials (Temporary Passwords - Must be changed on first login)\n")
         f.write("=" * 70 + "\n\n")
         f.write("Username  |  Temporary Password\n")
@@ -155,6 +233,25 @@ if __name__ == "__main__":
             f.write(f"{username}  |  {password}\n")
         f.write("\n" + "=" * 70 + "\n")
         f.write("NOTE: Please change your password upon first login for security purposes.\n")
-    
-    print(f"Created {len(credentials)} student accounts successfully!")
-    print("Credentials have been saved to 'student_credentials.txt'")
+
+def main():
+    parser = argparse.ArgumentParser(description='Provision student accounts')
+    parser.add_argument('--roster', help='CSV or NDJSON roster (usn, first_name, last_name, email, department)')
+    parser.add_argument('--db', default='student_tracking.db', help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Password hashing processes (default: all cores)')
+    parser.add_argument('--output', default='student_credentials.txt',
+                        help='Where to write the temporary credentials')
+    args = parser.parse_args()
+
+    print("Creating student accounts...")
+    start = datetime.now()
+    credentials = populate_student_data(args.db, args.roster, args.workers)
+    write_credentials(credentials, args.output)
+
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"Created {len(credentials)} student accounts successfully in {elapsed:.1f}s!")
+    print(f"Credentials have been saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
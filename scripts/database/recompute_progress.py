@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Rebuild XP and levels in user_progress after a change to the reward tables.
+
+Streams the collection in _id order, recomputes each document with
+UserProgress.recompute and writes changed documents back in chunked,
+unordered bulk_writes. A checkpoint is saved after every chunk so an
+interrupted run can continue with --resume.
+
+Documents created before activity_counts were tracked first get an
+`xp_baseline`: the XP their counts do not explain, which is kept as-is.
+Run with --seed-only right after deploying so baselines are taken while
+the reward tables still match what was awarded. Documents whose baseline
+could not be seeded are skipped, never rebuilt from partial counts.
+
+Usage: python -m scripts.database.recompute_progress [--chunk-size 1000] [--resume] [--dry-run] [--seed-only]
+"""
+import sys
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+
+from app.config import Config
+from app.gamification.achievements import UserProgress, LEVEL_XP_STEP
+
+JOB_ID = 'recompute_progress'
+PROJECTION = {'xp': 1, 'level': 1, 'xp_baseline': 1, 'activity_counts': 1, 'achievements.key': 1, 'achievements.completed': 1}
+
+def recompute_pipeline(xp_delta):
+    """Apply the XP correction as a delta so XP earned while the job runs is kept"""
+    return [
+        {'$set': {
+            'xp': {'$add': [{'$ifNull': ['$xp', 0]}, xp_delta]},
+            'version': {'$add': [{'$ifNull': ['$version', 0]}, 1]}
+        }},
+        {'$set': {'level': {'$max': [
+            1, {'$toInt': {'$floor': {'$sqrt': {'$divide': ['$xp', LEVEL_XP_STEP]}}}}
+        ]}}}
+    ]
+
+def seed_xp_baselines(collection, chunk_size=1000, dry_run=False):
+    """Give older documents an xp_baseline; returns the number seeded.
+
+    Each write is guarded on the XP it was computed from, so a document that
+    earns XP meanwhile is left unseeded (and skipped by the recompute) until
+    the next run.
+    """
+    seeded = 0
+    operations = []
+    for doc in collection.find({'xp_baseline': None}, PROJECTION):
+        xp = doc.get('xp', 0)
+        operations.append(UpdateOne(
+            {'_id': doc['_id'], 'xp': doc.get('xp'), 'xp_baseline': None},
+            {'$set': {'xp_baseline': xp - UserProgress.tracked_xp(doc)}, '$inc': {'version': 1}}
+        ))
+        if len(operations) == chunk_size:
+            seeded += flush(collection, operations, dry_run)
+            operations = []
+    seeded += flush(collection, operations, dry_run)
+    return seeded
+
+def load_checkpoint(db):
+    return db.job_checkpoints.find_one({'_id': JOB_ID})
+
+def save_checkpoint(db, last_id, processed, updated):
+    db.job_checkpoints.update_one(
+        {'_id': JOB_ID},
+        {
+            '$set': {'last_id': last_id, 'processed': processed, 'updated': updated, 'updated_at': datetime.utcnow()},
+            '$setOnInsert': {'started_at': datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+def recompute_progress(db, chunk_size=1000, resume=False, dry_run=False):
+    """Recompute every user's XP and level; returns (processed, updated, skipped)"""
+    collection = db.user_progress
+    query = {}
+    processed = updated = skipped = 0
+
+    seeded = seed_xp_baselines(collection, chunk_size, dry_run)
+    if seeded:
+        print(f"{seeded} XP baselines {'to seed' if dry_run else 'seeded'}")
+
+    checkpoint = load_checkpoint(db) if resume else None
+    if checkpoint:
+        query = {'_id': {'$gt': checkpoint['last_id']}}
+        processed, updated = checkpoint['processed'], checkpoint['updated']
+        print(f"Resuming after {checkpoint['last_id']} ({processed} already processed)")
+    elif not dry_run:
+        db.job_checkpoints.delete_one({'_id': JOB_ID})
+
+    total = collection.estimated_document_count()
+    started = time.monotonic()
+    start_processed = processed
+    operations = []
+    last_id = None
+
+    cursor = collection.find(query, PROJECTION, no_cursor_timeout=True).sort('_id', 1).batch_size(chunk_size)
+    try:
+        for doc in cursor:
+            recomputed = UserProgress.recompute(doc)
+            if recomputed is None:
+                # In a dry run baselines are not written, so this only counts the unseeded ones
+                skipped += 1
+            elif recomputed != (doc.get('xp'), doc.get('level')):
+                xp = recomputed[0]
+                operations.append(UpdateOne({'_id': doc['_id']}, recompute_pipeline(xp - doc.get('xp', 0))))
+            processed += 1
+            last_id = doc['_id']
+
+            if processed % chunk_size == 0:
+                updated += flush(collection, operations, dry_run)
+                operations = []
+                if not dry_run:
+                    save_checkpoint(db, last_id, processed, updated)
+                report(processed, updated, total, started, start_processed)
+    finally:
+        cursor.close()
+
+    updated += flush(collection, operations, dry_run)
+    if last_id is not None and not dry_run:
+        save_checkpoint(db, last_id, processed, updated)
+    report(processed, updated, total, started, start_processed)
+    if skipped:
+        print(f"{skipped} documents skipped: no XP baseline yet, rerun to retry")
+    return processed, updated, skipped
+
+def flush(collection, operations, dry_run):
+    if not operations:
+        return 0
+    if dry_run:
+        return len(operations)
+    result = collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+def report(processed, updated, total, started, start_processed):
+    elapsed = time.monotonic() - started
+    rate = (processed - start_processed) / elapsed if elapsed else 0
+    remaining = (total - processed) / rate if rate and total > processed else 0
+    print(f"{processed}/{total} processed, {updated} updated, "
+          f"{rate:.0f} docs/s, ~{remaining:.0f}s remaining")
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute XP and levels for all users')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='Documents per bulk_write (default: 1000)')
+    parser.add_argument('--resume', action='store_true', help='Continue from the last saved checkpoint')
+    parser.add_argument('--dry-run', action='store_true', help='Count changes without writing them')
+    parser.add_argument('--seed-only', action='store_true', help='Only seed XP baselines for older documents')
+    args = parser.parse_args()
+
+    client = MongoClient(Config.MONGODB_URI)
+    try:
+        db = client[Config.MONGODB_NAME]
+        if args.seed_only:
+            seeded = seed_xp_baselines(db.user_progress, args.chunk_size, args.dry_run)
+            print(f"Done: {seeded} XP baselines {'to seed' if args.dry_run else 'seeded'}")
+            return
+        processed, updated, _ = recompute_progress(db, args.chunk_size, args.resume, args.dry_run)
+        verb = 'would change' if args.dry_run else 'updated'
+        print(f"Done: {processed} users processed, {updated} {verb}")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
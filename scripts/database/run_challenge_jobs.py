@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Run the challenge background jobs in their own long-lived process.
+
+The scheduler generates each daily and weekly challenge set just after the
+period boundary, and the archiver moves user challenges finished more than
+CHALLENGE_ARCHIVE_AFTER_DAYS ago into user_challenges_archive (hourly by
+default).
+Both are idempotent, so running this alongside the /api/challenges/generate
+endpoint, or on more than one host, is harmless. With --once each job runs
+a single pass and the script exits, for use from cron instead of as a service.
+
+Usage: python -m scripts.database.run_challenge_jobs [--once] [--archive-interval 3600]
+"""
+import sys
+import asyncio
+import logging
+import argparse
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import Config
+from app.gamification.challenges import ChallengeSystem, ChallengeScheduler, ChallengeArchiver
+
+async def run_jobs(db, once=False, archive_interval=3600):
+    system = ChallengeSystem(db)
+    await system.ensure_indexes()
+    archiver = ChallengeArchiver(
+        system,
+        retention_days=Config.CHALLENGE_ARCHIVE_AFTER_DAYS,
+        interval_seconds=archive_interval
+    )
+    if once:
+        print(f"{await system.generate_challenges()} challenges created")
+        print(f"{await archiver.archive_once()} user challenges archived")
+        return
+    await asyncio.gather(ChallengeScheduler(system).run(), archiver.run())
+
+def main():
+    parser = argparse.ArgumentParser(description='Run challenge generation and archiving')
+    parser.add_argument('--once', action='store_true', help='Run one pass of each job and exit')
+    parser.add_argument('--archive-interval', type=int, default=3600, help='Seconds between archive passes')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    client = AsyncIOMotorClient(Config.MONGODB_URI)
+    try:
+        asyncio.run(run_jobs(client[Config.MONGODB_NAME], args.once, args.archive_interval))
+    except KeyboardInterrupt:
+        print("Stopped")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Send due-date reminders for tasks as notifications.
+
+Runs the TaskReminderScanner: upcoming reminders are loaded one horizon at
+a time through due_date index range scans and fired in batches from a
+timing wheel. Each task's reminder_frequency ('daily', 'weekly' or 'custom')
+sets when its reminders go out.
+
+Usage: python -m scripts.database.send_task_reminders [--uri mongodb://localhost:27017/] [--db student_handbook] [--horizon-minutes 60]
+"""
+import sys
+import logging
+import argparse
+from pymongo import MongoClient
+
+from services.task_reminders import TaskReminderScanner
+
+def main():
+    parser = argparse.ArgumentParser(description='Send task due-date reminders')
+    parser.add_argument('--uri', default='mongodb://localhost:27017/', help='MongoDB connection URI')
+    parser.add_argument('--db', default='student_handbook', help='Database name')
+    parser.add_argument('--horizon-minutes', type=int, default=60, help='How far ahead each scan loads reminders')
+    parser.add_argument('--scan-interval', type=int, default=300, help='Seconds between incremental scans')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    client = MongoClient(args.uri)
+    scanner = TaskReminderScanner(client[args.db], horizon_minutes=args.horizon_minutes)
+    try:
+        scanner.run(scan_interval_seconds=args.scan_interval)
+    except KeyboardInterrupt:
+        print("Stopped")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
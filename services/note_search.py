@@ -0,0 +1,209 @@
+# services/note_search.py
+
+import re
+import math
+import html
+from bisect import bisect_left
+
+from pymongo.errors import OperationFailure
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'in', 'is', 'it', 'of', 'on', 'or', 'the', 'to', 'with'}
+MAX_TERMS = 1000
+TITLE_WEIGHT = 5
+SNIPPET_WIDTH = 160
+INDEX_NOT_FOUND = 27  # server error code when $text runs without a text index
+
+def tokenize(text):
+    return [word for word in WORD_RE.findall((text or '').lower()) if word not in STOPWORDS]
+
+def note_terms(title, content):
+    """Distinct lowercase words of a note, stored as `terms` for indexed prefix matching"""
+    return sorted(set(tokenize(title) + tokenize(content)))[:MAX_TERMS]
+
+def query_words(query):
+    return tokenize(query)[:10]
+
+def snippet(content, words, width=SNIPPET_WIDTH):
+    """HTML-escaped excerpt around the first match, with matching word prefixes in <mark>"""
+    content = content or ''
+    if not words:
+        return html.escape(content[:width])
+    pattern = re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")\w*", re.IGNORECASE)
+    match = pattern.search(content)
+    start = max(0, match.start() - width // 3) if match else 0
+    excerpt = content[start:start + width]
+
+    parts, last = [], 0
+    for m in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[last:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        last = m.end()
+    parts.append(html.escape(excerpt[last:]))
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(content) else ''
+    return prefix + ''.join(parts) + suffix
+
+def _result(note_id, title, content, score, words):
+    return {
+        'id': str(note_id),
+        'title': title,
+        'score': round(score, 4),
+        'snippet': snippet(content, words)
+    }
+
+class NoteSearch:
+    """Per-user note search on MongoDB.
+
+    Whole words are matched and ranked by a (username, title, content) text
+    index, with title matches weighted higher. When that finds fewer than
+    `limit` notes, word prefixes are matched against the indexed `terms`
+    array (anchored regexes are index range scans), so "algo" finds
+    "algorithms" while the user is still typing. Every query word must
+    match on both passes.
+
+    Without a text index (a fresh or restored database before
+    ensure_indexes has run) the user's notes are loaded into an
+    InvertedIndex and searched there instead, with the same rules.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self):
+        self.collection.create_index(
+            [('username', 1), ('title', 'text'), ('content', 'text')],
+            weights={'title': TITLE_WEIGHT, 'content': 1},
+            name='notes_text'
+        )
+        self.collection.create_index([('username', 1), ('terms', 1)])
+
+    def search(self, username, query, limit=20):
+        words = query_words(query)
+        if not words:
+            return []
+
+        # $text alone matches any of the words; requiring them all in `terms` makes it AND
+        cursor = self.collection.find(
+            {'username': username, '$text': {'$search': ' '.join(words)}, 'terms': {'$all': words}},
+            {'title': 1, 'content': 1, 'score': {'$meta': 'textScore'}}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(limit)
+        try:
+            matches = list(cursor)
+        except OperationFailure as e:
+            if e.code != INDEX_NOT_FOUND:
+                raise
+            return self._search_without_text_index(username, query, limit)
+
+        results = [
+            _result(note['_id'], note.get('title'), note.get('content'), note['score'], words)
+            for note in matches
+        ]
+
+        if len(results) < limit:
+            found = {r['id'] for r in results}
+            prefix_query = {
+                'username': username,
+                '$and': [{'terms': {'$regex': f'^{re.escape(word)}'}} for word in words]
+            }
+            prefix_matches = self.collection.find(prefix_query, {'title': 1, 'content': 1}).limit(limit * 2)
+            extra = []
+            for note in prefix_matches:
+                if str(note['_id']) in found:
+                    continue
+                # Ranked below every whole-word match: the share of query words hit in the title
+                title_terms = tokenize(note.get('title'))
+                in_title = sum(1 for w in words if any(t.startswith(w) for t in title_terms))
+                extra.append(_result(note['_id'], note.get('title'), note.get('content'), in_title / (len(words) + 1), words))
+            extra.sort(key=lambda r: r['score'], reverse=True)
+            results.extend(extra[:limit - len(results)])
+        return results
+
+    def _search_without_text_index(self, username, query, limit):
+        index = InvertedIndex()
+        for note in self.collection.find({'username': username}, {'title': 1, 'content': 1}):
+            index.add(note['_id'], username, note.get('title'), note.get('content'))
+        return index.search(username, query, limit)
+
+class InvertedIndex:
+    """In-memory counterpart of NoteSearch (same tokenizer, prefix matching and snippets).
+
+    NoteSearch builds one from a user's notes when the database has no
+    text index. It is not kept as a long-lived copy: every worker would
+    need its own, kept in sync with MongoDB.
+
+    Each user has their own postings (term -> {note_id: weighted term
+    frequency}) and a sorted term list for prefix lookups by bisect, so a
+    query only ever touches the caller's notes. Scores are tf-idf summed
+    over the query words, each word taking its best-matching prefix expansion.
+    """
+
+    def __init__(self):
+        self._users = {}   # username -> {"postings": {term: {note_id: weight}}, "terms": [sorted], "notes": count}
+        self._notes = {}   # note_id -> (username, title, content, terms)
+
+    def add(self, note_id, username, title, content):
+        self.remove(note_id)
+        weights = {}
+        for term in tokenize(title):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(content):
+            weights[term] = weights.get(term, 0) + 1
+
+        index = self._users.setdefault(username, {"postings": {}, "terms": [], "notes": 0})
+        index["notes"] += 1
+        for term, weight in weights.items():
+            if term not in index["postings"]:
+                index["postings"][term] = {}
+                index["terms"].insert(bisect_left(index["terms"], term), term)
+            index["postings"][term][note_id] = weight
+        self._notes[note_id] = (username, title, content, list(weights))
+
+    def remove(self, note_id):
+        if note_id not in self._notes:
+            return
+        username, _, _, terms = self._notes.pop(note_id)
+        index = self._users[username]
+        index["notes"] -= 1
+        for term in terms:
+            postings = index["postings"][term]
+            postings.pop(note_id, None)
+            if not postings:
+                del index["postings"][term]
+                del index["terms"][bisect_left(index["terms"], term)]
+
+    @staticmethod
+    def _expand(terms, prefix):
+        i = bisect_left(terms, prefix)
+        while i < len(terms) and terms[i].startswith(prefix):
+            yield terms[i]
+            i += 1
+
+    def search(self, username, query, limit=20):
+        words = query_words(query)
+        index = self._users.get(username)
+        if not words or index is None:
+            return []
+
+        total = index["notes"] or 1
+        scores = None
+        for word in words:
+            word_scores = {}
+            for term in self._expand(index["terms"], word):
+                postings = index["postings"][term]
+                idf = math.log(1 + total / len(postings))
+                for note_id, weight in postings.items():
+                    word_scores[note_id] = max(word_scores.get(note_id, 0), weight * idf)
+            # Every query word must match
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {n: s + word_scores[n] for n, s in scores.items() if n in word_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            _result(note_id, self._notes[note_id][1], self._notes[note_id][2], score, words)
+            for note_id, score in ranked
+        ]
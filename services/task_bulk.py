@@ -0,0 +1,141 @@
+# services/task_bulk.py
+
+import json
+from datetime import datetime, date
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from services.task_reminders import REMINDER_FIELDS, reminder_settings
+
+MAX_BULK_ITEMS = 1000
+TASK_STATUSES = {'pending', 'in_progress', 'completed'}
+UPDATABLE_FIELDS = {'title', 'description', 'due_date', 'status', *REMINDER_FIELDS}
+
+def parse_items(body, content_type=''):
+    """Items of a JSON array or an NDJSON stream (one JSON object per line)"""
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if 'ndjson' in (content_type or '') or not text.lstrip().startswith('['):
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON array or NDJSON lines')
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f'At most {MAX_BULK_ITEMS} items per request')
+    return items
+
+class TaskBulkProcessor:
+    """Validates a batch of task creates, updates and completions in one pass and
+    applies them with a single unordered bulk_write, reporting a result per item.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._dates = {}
+
+    def _parse_date(self, value):
+        # Semester plans repeat the same few dates; parse each distinct string once
+        if value not in self._dates:
+            self._dates[value] = datetime.combine(date.fromisoformat(value), datetime.min.time())
+        return self._dates[value]
+
+    def _fields(self, item, required):
+        # The reminder fields depend on each other, so they are validated together
+        fields = reminder_settings(item)
+        for key in (UPDATABLE_FIELDS - set(REMINDER_FIELDS)) & item.keys():
+            value = item[key]
+            if key == 'due_date':
+                try:
+                    value = self._parse_date(value)
+                except (TypeError, ValueError):
+                    raise ValueError('due_date must be a YYYY-MM-DD date')
+            elif key == 'status' and value not in TASK_STATUSES:
+                raise ValueError(f"status must be one of {', '.join(sorted(TASK_STATUSES))}")
+            elif key in ('title', 'description') and not isinstance(value, str):
+                raise ValueError(f'{key} must be a string')
+            fields[key] = value
+        missing = [key for key in required if not fields.get(key)]
+        if missing:
+            raise ValueError(f"Missing {', '.join(missing)}")
+        return fields
+
+    def _validate(self, index, item, username, now):
+        """(operation, result) for one item; operation is None when the item is rejected"""
+        if not isinstance(item, dict):
+            return None, {'index': index, 'status': 'error', 'error': 'Item must be an object'}
+        op = item.get('op') or ('update' if 'id' in item else 'create')
+        try:
+            if op == 'create':
+                task = self._fields(item, required=('title', 'due_date'))
+                task_id = ObjectId()
+                return InsertOne({
+                    '_id': task_id,
+                    'username': username,
+                    'title': task['title'],
+                    'description': task.get('description', ''),
+                    'due_date': task['due_date'],
+                    'status': task.get('status', 'pending'),
+                    **{key: task[key] for key in REMINDER_FIELDS if key in task},
+                    'created_at': now
+                }), {'index': index, 'status': 'created', 'id': str(task_id)}
+
+            if op not in ('update', 'complete'):
+                raise ValueError(f'Unknown op: {op}')
+            if not ObjectId.is_valid(item.get('id')):
+                raise ValueError('A valid task id is required')
+            task_id = ObjectId(item['id'])
+            if op == 'complete':
+                changes = {'status': 'completed', 'completed_at': now}
+            else:
+                changes = self._fields(item, required=())
+                if not changes:
+                    raise ValueError('Nothing to update')
+                if changes.get('status') == 'completed':
+                    changes['completed_at'] = now
+            changes['updated_at'] = now
+            return UpdateOne(
+                {'_id': task_id, 'username': username},
+                {'$set': changes}
+            ), {'index': index, 'status': 'completed' if op == 'complete' else 'updated', 'id': str(task_id)}
+        except ValueError as e:
+            return None, {'index': index, 'status': 'error', 'error': str(e)}
+
+    def apply(self, items, username):
+        """Returns (results, summary); results are in request order"""
+        now = datetime.now()
+        operations, op_items, results = [], [], []
+        for index, item in enumerate(items):
+            operation, result = self._validate(index, item, username, now)
+            results.append(result)
+            if operation is not None:
+                operations.append(operation)
+                op_items.append(index)
+
+        # One lookup flags updates to tasks that do not exist or belong to someone else
+        referenced = {ObjectId(results[i]['id']) for i, op in zip(op_items, operations) if isinstance(op, UpdateOne)}
+        if referenced:
+            existing = {doc['_id'] for doc in self.collection.find(
+                {'_id': {'$in': list(referenced)}, 'username': username}, {'_id': 1}
+            )}
+            kept = []
+            for i, op in zip(op_items, operations):
+                if isinstance(op, UpdateOne) and ObjectId(results[i]['id']) not in existing:
+                    results[i] = {'index': i, 'status': 'error', 'id': results[i]['id'], 'error': 'Task not found'}
+                else:
+                    kept.append((i, op))
+            op_items = [i for i, _ in kept]
+            operations = [op for _, op in kept]
+
+        if operations:
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    i = op_items[error['index']]
+                    results[i] = {'index': i, 'status': 'error', 'id': results[i].get('id'), 'error': error.get('errmsg')}
+
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        return results, summary
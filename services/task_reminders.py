@@ -0,0 +1,202 @@
+# services/task_reminders.py
+
+import time
+import logging
+from datetime import datetime, timedelta
+
+from models.database_models import NotificationModel
+from utils.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# Hours before the due date at which each reminder_frequency sends a reminder
+REMINDER_OFFSETS = {
+    'daily': (72, 48, 24),
+    'weekly': (336, 168),
+}
+DEFAULT_FREQUENCY = 'daily'
+REMINDER_FREQUENCIES = (*REMINDER_OFFSETS, 'custom')
+# 'custom' tasks pick their own offsets (reminder_offsets_hours) from this list
+CUSTOM_OFFSET_CHOICES = (1, 6, 12, 24, 48, 72, 168, 336)
+ALL_OFFSETS = sorted(set(CUSTOM_OFFSET_CHOICES).union(*REMINDER_OFFSETS.values()))
+REMINDER_FIELDS = ('reminder_frequency', 'reminder_offsets_hours')
+
+TASK_PROJECTION = {'username': 1, 'title': 1, 'due_date': 1, 'reminder_frequency': 1, 'reminder_offsets_hours': 1}
+
+def reminder_settings(data):
+    """Validated reminder fields of a task create/update payload; raises ValueError"""
+    settings = {}
+    frequency = data.get('reminder_frequency')
+    if frequency is not None:
+        if frequency not in REMINDER_FREQUENCIES:
+            raise ValueError(f"reminder_frequency must be one of {', '.join(REMINDER_FREQUENCIES)}")
+        settings['reminder_frequency'] = frequency
+    offsets = data.get('reminder_offsets_hours')
+    if offsets is not None:
+        if (not isinstance(offsets, list) or not offsets
+                or any(type(h) is not int or h not in CUSTOM_OFFSET_CHOICES for h in offsets)):
+            raise ValueError(
+                f"reminder_offsets_hours must be a list of hours from {', '.join(map(str, CUSTOM_OFFSET_CHOICES))}"
+            )
+        settings['reminder_offsets_hours'] = sorted(set(offsets), reverse=True)
+    elif frequency == 'custom':
+        raise ValueError('custom reminders need reminder_offsets_hours')
+    return settings
+
+def reminder_offsets(task):
+    """Reminder offsets in hours for a task, from its reminder_frequency"""
+    frequency = task.get('reminder_frequency') or DEFAULT_FREQUENCY
+    if frequency == 'custom':
+        offsets = [h for h in task.get('reminder_offsets_hours') or [] if h in CUSTOM_OFFSET_CHOICES]
+        if offsets:
+            return offsets
+        frequency = DEFAULT_FREQUENCY
+    return REMINDER_OFFSETS.get(frequency, REMINDER_OFFSETS[DEFAULT_FREQUENCY])
+
+def due_date_bands(start, end):
+    """Merged due_date ranges (low, high] holding every reminder that fires in (start, end]"""
+    bands = []
+    for hours in ALL_OFFSETS:
+        low, high = start + timedelta(hours=hours), end + timedelta(hours=hours)
+        if bands and low <= bands[-1][1]:
+            bands[-1] = (bands[-1][0], max(bands[-1][1], high))
+        else:
+            bands.append((low, high))
+    return bands
+
+def _due_in(hours):
+    if hours % 24 == 0:
+        days = hours // 24
+        return f"in {days} day{'s' if days != 1 else ''}"
+    return f"in {hours} hour{'s' if hours != 1 else ''}"
+
+class TaskReminderScanner:
+    """Sends task due-date reminders as notifications without polling every user's tasks.
+
+    Each scan only reads the time horizon it has not covered yet: tasks whose
+    due_date puts one of their reminders in (scanned_until, now + horizon],
+    found through due_date index range scans, plus tasks written since the
+    last scan. Those reminders go into a hierarchical timing wheel; every
+    tick fires whatever came due as one batch. A fired batch re-reads its
+    tasks, drops reminders for completed or rescheduled tasks, and inserts
+    the rest with a single insert_many.
+    """
+
+    def __init__(self, db, horizon_minutes=60, tick_seconds=60):
+        self.tasks = db['tasks']
+        self.users = db['users']
+        self.notifications = NotificationModel(db)
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.tick_seconds = tick_seconds
+        self.wheel = None
+        self.scanned_until = None
+        self.last_scan_at = None
+        self._scheduled = set()  # (task_id, fire_at) already in the wheel
+
+    def ensure_indexes(self):
+        self.tasks.create_index([('due_date', 1)])
+        self.tasks.create_index([('created_at', 1)])
+        self.tasks.create_index([('updated_at', 1)], sparse=True)
+
+    def _schedule(self, task, after, until):
+        """Put the task's reminders that fire in (after, until] into the wheel"""
+        due_date = task.get('due_date')
+        if not isinstance(due_date, datetime):
+            return 0
+        added = 0
+        for hours in reminder_offsets(task):
+            fire_at = due_date - timedelta(hours=hours)
+            key = (task['_id'], fire_at)
+            if after < fire_at <= until and key not in self._scheduled:
+                self._scheduled.add(key)
+                self.wheel.schedule(fire_at.timestamp(), (task['_id'], due_date, hours, fire_at))
+                added += 1
+        return added
+
+    def scan(self, now=None):
+        """Load the reminders of the next uncovered horizon; returns how many were scheduled"""
+        now = now or datetime.now()
+        if self.wheel is None:
+            self.wheel = TimingWheel(tick_seconds=self.tick_seconds, start=now.timestamp())
+            self.scanned_until = now
+        start, end = self.scanned_until, now + self.horizon
+        added = 0
+
+        if end > start:
+            bands = due_date_bands(start, end)
+            query = {
+                '$or': [{'due_date': {'$gt': low, '$lte': high}} for low, high in bands],
+                'status': {'$ne': 'completed'}
+            }
+            for task in self.tasks.find(query, TASK_PROJECTION):
+                added += self._schedule(task, start, end)
+            self.scanned_until = end
+
+        if self.last_scan_at is not None:
+            # Tasks created or rescheduled since the last scan may have reminders
+            # inside a horizon that was already covered
+            written = {
+                '$or': [{'created_at': {'$gt': self.last_scan_at}}, {'updated_at': {'$gt': self.last_scan_at}}],
+                'due_date': {'$gt': now},
+                'status': {'$ne': 'completed'}
+            }
+            for task in self.tasks.find(written, dict(TASK_PROJECTION, created_at=1, updated_at=1)):
+                # Never remind for a time before the write; reminders still in the wheel are deduplicated
+                written_at = task.get('updated_at') or task.get('created_at')
+                added += self._schedule(task, written_at, self.scanned_until)
+        self.last_scan_at = now
+        return added
+
+    def fire_due(self, now=None):
+        """Send every reminder that has come due as one batch; returns how many were sent"""
+        now = now or datetime.now()
+        if self.wheel is None:
+            return 0
+        due = {}
+        for task_id, due_date, hours, fire_at in self.wheel.advance(now.timestamp()):
+            self._scheduled.discard((task_id, fire_at))
+            # After a pause several reminders for one task can come due together; send the latest
+            if task_id not in due or hours < due[task_id][1]:
+                due[task_id] = (due_date, hours)
+        if not due:
+            return 0
+
+        tasks = {task['_id']: task for task in self.tasks.find(
+            {'_id': {'$in': list(due)}, 'status': {'$ne': 'completed'}},
+            {'username': 1, 'title': 1, 'due_date': 1}
+        )}
+        # Reminders for completed, deleted or rescheduled tasks are dropped
+        tasks = {task_id: task for task_id, task in tasks.items() if task.get('due_date') == due[task_id][0]}
+        usernames = {task['username'] for task in tasks.values()}
+        user_ids = {user['username']: user['_id'] for user in self.users.find(
+            {'username': {'$in': list(usernames)}}, {'username': 1}
+        )}
+
+        notifications = []
+        for task_id, task in tasks.items():
+            if task['username'] not in user_ids:
+                logger.warning(f"No user {task['username']} for task {task_id}; reminder skipped")
+                continue
+            notifications.append({
+                'student_id': user_ids[task['username']],
+                'type': 'task_reminder',
+                'message': f"Reminder: '{task.get('title')}' is due {_due_in(due[task_id][1])} "
+                           f"({task['due_date'].strftime('%b %d, %Y')})"
+            })
+        self.notifications.create_notifications(notifications)
+        return len(notifications)
+
+    def run(self, scan_interval_seconds=300, stop_after=None):
+        """Scan and fire until interrupted (or for `stop_after` seconds)"""
+        self.ensure_indexes()
+        started = time.monotonic()
+        next_scan = 0
+        while stop_after is None or time.monotonic() - started < stop_after:
+            if time.monotonic() >= next_scan:
+                scheduled = self.scan()
+                logger.info(f"Scanned up to {self.scanned_until}: {scheduled} reminders scheduled")
+                next_scan = time.monotonic() + scan_interval_seconds
+            sent = self.fire_due()
+            if sent:
+                logger.info(f"Sent {sent} task reminders")
+            time.sleep(self.tick_seconds)
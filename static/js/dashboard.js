@@ -25,26 +25,61 @@ document.addEventListener('DOMContentLoaded', () => {
     const addNoteModal = document.getElementById('add-note-modal');
     const addNoteForm = document.getElementById('add-note-form');
 
-    // Load Notes
-    const loadNotes = async () => {
+    // "Load more" button shown under a paginated list while another page exists
+    const createLoadMore = (container, load) => {
+        const button = document.createElement('button');
+        button.className = 'add-btn load-more-btn';
+        button.textContent = 'Load more';
+        button.style.display = 'none';
+        button.addEventListener('click', () => load(false));
+        container.after(button);
+        return button;
+    };
+
+    // Load Notes (one page at a time; reset starts again from the newest)
+    let notesCursor = null;
+    const loadNotes = async (reset = true) => {
         try {
-            const response = await fetch('/api/notes');
+            const params = new URLSearchParams();
+            if (!reset && notesCursor) params.set('cursor', notesCursor);
+            const response = await fetch(`/api/notes?${params}`);
             const data = await response.json();
             if (data.success) {
-                notesContainer.innerHTML = data.notes.map(note => `
-                    <div class="note-card">
+                const html = data.notes.map(note => `
+                    <div class="note-card" data-note-id="${note.id}">
                         <h3>${note.title}</h3>
-                        <p>${note.content}</p>
+                        <p>${note.preview}</p>
                         <div class="note-footer">
                             <span class="date">${new Date(note.created_at).toLocaleDateString()}</span>
                         </div>
                     </div>
                 `).join('');
+                if (reset) notesContainer.innerHTML = html;
+                else notesContainer.insertAdjacentHTML('beforeend', html);
+                notesCursor = data.next_cursor;
+                loadMoreNotesBtn.style.display = notesCursor ? '' : 'none';
             }
         } catch (error) {
             console.error('Error loading notes:', error);
         }
     };
+    const loadMoreNotesBtn = createLoadMore(notesContainer, loadNotes);
+
+    // Expand a note to its full content on click
+    notesContainer.addEventListener('click', async (e) => {
+        const card = e.target.closest('.note-card');
+        if (!card || card.dataset.expanded) return;
+        try {
+            const response = await fetch(`/api/notes/${card.dataset.noteId}`);
+            const data = await response.json();
+            if (data.success) {
+                card.querySelector('p').textContent = data.note.content;
+                card.dataset.expanded = 'true';
+            }
+        } catch (error) {
+            console.error('Error loading note:', error);
+        }
+    });
 
     // Add Note
     addNoteBtn.addEventListener('click', () => {
@@ -82,29 +117,37 @@ document.addEventListener('DOMContentLoaded', () => {
     const addTaskModal = document.getElementById('add-task-modal');
     const addTaskForm = document.getElementById('add-task-form');
 
-    // Load Tasks
-    const loadTasks = async () => {
+    // Load Tasks (soonest due first, one page at a time)
+    let tasksCursor = null;
+    const loadTasks = async (reset = true) => {
         try {
-            const response = await fetch('/api/tasks');
+            const params = new URLSearchParams();
+            if (!reset && tasksCursor) params.set('cursor', tasksCursor);
+            const response = await fetch(`/api/tasks?${params}`);
             const data = await response.json();
             if (data.success) {
-                tasksContainer.innerHTML = data.tasks.map(task => `
+                const html = data.tasks.map(task => `
                     <div class="task-card ${task.status}">
                         <div class="task-header">
                             <h3>${task.title}</h3>
                             <span class="due-date">Due: ${new Date(task.due_date).toLocaleDateString()}</span>
                         </div>
-                        <p>${task.description}</p>
+                        <p>${task.preview}</p>
                         <div class="task-footer">
                             <span class="status">${task.status}</span>
                         </div>
                     </div>
                 `).join('');
+                if (reset) tasksContainer.innerHTML = html;
+                else tasksContainer.insertAdjacentHTML('beforeend', html);
+                tasksCursor = data.next_cursor;
+                loadMoreTasksBtn.style.display = tasksCursor ? '' : 'none';
             }
         } catch (error) {
             console.error('Error loading tasks:', error);
         }
     };
+    const loadMoreTasksBtn = createLoadMore(tasksContainer, loadTasks);
 
     // Add Task
     addTaskBtn.addEventListener('click', () => {
@@ -146,7 +189,17 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    // Initial Load
-    loadNotes();
-    loadTasks();
+    // Initial Load (the server renders the first page of each panel; fetch only if it did not)
+    if (notesContainer.dataset.rendered) {
+        notesCursor = notesContainer.dataset.nextCursor || null;
+        loadMoreNotesBtn.style.display = notesCursor ? '' : 'none';
+    } else {
+        loadNotes();
+    }
+    if (tasksContainer.dataset.rendered) {
+        tasksCursor = tasksContainer.dataset.nextCursor || null;
+        loadMoreTasksBtn.style.display = tasksCursor ? '' : 'none';
+    } else {
+        loadTasks();
+    }
 });
@@ -0,0 +1,73 @@
+import threading
+
+from utils import fragment_cache
+from utils.fragment_cache import FragmentCache
+
+def test_entries_are_served_until_the_next_write():
+    cache = FragmentCache()
+    version = cache.version('alice')
+    cache.put('alice', version, {'panel': 'a'})
+    assert cache.get('alice') == {'panel': 'a'}
+    cache.bump('alice')
+    assert cache.get('alice') is None
+
+def test_write_during_render_is_not_cached():
+    cache = FragmentCache()
+    version = cache.version('alice')
+    cache.bump('alice')
+    cache.put('alice', version, {'panel': 'stale'})
+    assert cache.get('alice') is None
+
+    cache.put('alice', cache.version('alice'), {'panel': 'a'})
+    version = cache.version('alice')
+    cache.bump('alice')
+    cache.put('alice', version, {'panel': 'stale'})
+    assert cache.get('alice') is None
+
+def test_other_users_keep_their_entries():
+    cache = FragmentCache()
+    cache.put('alice', cache.version('alice'), {'panel': 'a'})
+    cache.bump('bob')
+    assert cache.get('alice') == {'panel': 'a'}
+
+def test_versions_are_only_kept_for_cached_users():
+    cache = FragmentCache(max_users=2)
+    for i in range(100):
+        cache.bump(f'user{i}')
+    assert cache._versions == {}
+    for user in ('a', 'b', 'c'):
+        cache.put(user, cache.version(user), {'panel': user})
+    assert set(cache._versions) == set(cache._entries) == {'b', 'c'}
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(fragment_cache.time, 'monotonic', lambda: now[0])
+    cache = FragmentCache(ttl_seconds=60)
+    cache.put('alice', cache.version('alice'), {'panel': 'a'})
+    now[0] += 60
+    assert cache.get('alice') is None
+
+def test_concurrent_use():
+    cache = FragmentCache(max_users=8)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(2000):
+                user = f'user{(n + i) % 16}'
+                if i % 3 == 0:
+                    cache.bump(user)
+                else:
+                    cache.put(user, cache.version(user), {'panel': user})
+                    cache.get(user)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache._entries) <= 8
+    assert set(cache._versions) == set(cache._entries)
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from app.gamification.achievements import GamificationSystem, UserProgress
+from app.gamification.background import BackgroundLoop
+from app.gamification.ingestion import ActivityIngestor, IngestionQueueFull
+
+class _NoDocuments:
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+class FakeCollection:
+    """Async stand-in for user_progress that records bulk writes and can be told to fail"""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise PyMongoError('database unavailable')
+        self.batches.append(operations)
+
+    def find(self, *args, **kwargs):
+        return _NoDocuments()
+
+class FakeDatabase:
+    def __init__(self):
+        self.user_progress = FakeCollection()
+
+class IdleLoop:
+    """Background loop that never runs, so tests drive flush() themselves"""
+    running = False
+
+    def start(self):
+        pass
+
+    def submit(self, coro):
+        coro.close()
+
+    def call_soon(self, callback, *args):
+        pass
+
+def _ingestor(background=None, **kwargs):
+    db = FakeDatabase()
+    ingestor = ActivityIngestor(GamificationSystem(db), background=background or IdleLoop(), **kwargs)
+    ingestor.start()
+    return ingestor, db.user_progress
+
+def _written(operations):
+    """user_id -> the $set stage applying its aggregate"""
+    return {op._filter['user_id']: op._doc[1]['$set'] for op in operations}
+
+def test_events_are_coalesced_per_user():
+    ingestor, collection = _ingestor()
+    for _ in range(3):
+        ingestor.submit('u1', 'create_note')
+    ingestor.submit('u1', 'complete_task', {'on_time': True})
+    ingestor.submit(2, 'create_note')
+    assert ingestor.pending_events == 5
+
+    assert asyncio.run(ingestor.flush()) == 5
+    assert len(collection.batches) == 1
+    written = _written(collection.batches[0])
+    assert set(written) == {'u1', '2'}
+    rewards = UserProgress.XP_REWARDS
+    assert written['u1']['xp'] == {'$add': ['$xp', 3 * rewards['create_note'] + rewards['complete_task']]}
+    assert written['u1']['stats.total_notes'] == {'$add': ['$stats.total_notes', 3]}
+    assert written['u1']['stats.tasks_completed_on_time'] == {'$add': ['$stats.tasks_completed_on_time', 1]}
+    assert written['u1']['activity_counts.create_note'] == {
+        '$add': [{'$ifNull': ['$activity_counts.create_note', 0]}, 3]
+    }
+    assert ingestor.pending_events == 0
+    assert asyncio.run(ingestor.flush()) == 0
+
+def test_failed_flush_requeues_the_batch():
+    ingestor, collection = _ingestor()
+    ingestor.submit('u1', 'create_note')
+    ingestor.submit('u1', 'create_note')
+    collection.failures = 1
+    with pytest.raises(PyMongoError):
+        asyncio.run(ingestor.flush())
+    assert ingestor.pending_events == 2
+
+    ingestor.submit('u1', 'create_note')
+    assert asyncio.run(ingestor.flush()) == 3
+    written = _written(collection.batches[0])
+    assert written['u1']['stats.total_notes'] == {'$add': ['$stats.total_notes', 3]}
+
+def test_full_buffer_pushes_back():
+    ingestor, _ = _ingestor(max_pending_events=3)
+    for _ in range(3):
+        ingestor.submit('u1', 'create_note')
+    with pytest.raises(IngestionQueueFull):
+        ingestor.submit('u2', 'create_note')
+    assert ingestor.pending_events == 3
+
+    asyncio.run(ingestor.flush())
+    ingestor.submit('u2', 'create_note')
+    assert ingestor.pending_events == 1
+    asyncio.run(ingestor.flush())
+
+def test_submit_requires_a_started_ingestor():
+    ingestor = ActivityIngestor(GamificationSystem(FakeDatabase()), background=IdleLoop())
+    with pytest.raises(RuntimeError):
+        ingestor.submit('u1', 'create_note')
+
+def test_flusher_writes_in_the_background():
+    ingestor, collection = _ingestor(background=BackgroundLoop('test-ingestor'), flush_interval_ms=10)
+    try:
+        ingestor.submit('u1', 'create_note')
+        deadline = time.monotonic() + 5
+        while not collection.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(collection.batches) == 1
+        assert ingestor.pending_events == 0
+    finally:
+        ingestor.close()
+
+def test_close_flushes_what_is_buffered():
+    # A flush interval far beyond the test, so only close() can write the events
+    ingestor, collection = _ingestor(background=BackgroundLoop('test-ingestor'), flush_interval_ms=60000)
+    for user in ('u1', 'u2', 'u1'):
+        ingestor.submit(user, 'create_note')
+    ingestor.close()
+    assert len(collection.batches) == 1
+    assert set(_written(collection.batches[0])) == {'u1', 'u2'}
+    assert ingestor.pending_events == 0
+    assert not ingestor.background.running
+    ingestor.close()
+    with pytest.raises(RuntimeError):
+        ingestor.submit('u1', 'create_note')
@@ -0,0 +1,144 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.gamification.achievements import Achievement, GamificationSystem, UserProgress
+from app.gamification.leaderboard import InMemorySortedSet, Leaderboard
+
+def test_sorted_set_ranks_by_score_then_member():
+    zset = InMemorySortedSet()
+    assert zset.zadd('k', {'b': 10, 'a': 10, 'c': 30}) == 3
+    assert zset.zrevrange('k', 0, -1) == ['c', 'a', 'b']
+    assert zset.zrevrank('k', 'a') == 1
+    assert zset.zrevrank('k', 'missing') is None
+    assert zset.zcard('k') == 3
+
+def test_sorted_set_updates_move_members():
+    zset = InMemorySortedSet()
+    zset.zadd('k', {'a': 10, 'b': 20})
+    assert zset.zadd('k', {'a': 25}) == 0
+    assert zset.zincrby('k', 5, 'b') == 25
+    assert zset.zincrby('k', 7, 'c') == 7
+    assert zset.zrevrange('k', 0, -1, withscores=True) == [('a', 25), ('b', 25), ('c', 7)]
+    assert zset.zrem('k', 'a', 'missing') == 1
+    assert zset.zscore('k', 'a') is None
+    assert zset.zrevrange('k', 0, 0) == ['b']
+
+def test_sorted_set_empty_key():
+    zset = InMemorySortedSet()
+    assert zset.zrevrange('k', 0, 10) == []
+    assert zset.zcard('k') == 0
+    assert zset.zscore('k', 'a') is None
+
+def _leaderboard():
+    leaderboard = Leaderboard()
+    for i in range(10):
+        leaderboard.set_xp(f'u{i}', i * 100, 'AI' if i % 2 else 'CSE')
+    return leaderboard
+
+def test_top_and_rank():
+    leaderboard = _leaderboard()
+    assert [e['user_id'] for e in leaderboard.top(3)] == ['u9', 'u8', 'u7']
+    assert leaderboard.top(1)[0] == {'rank': 1, 'user_id': 'u9', 'xp': 900}
+    assert leaderboard.rank('u7') == {'rank': 3, 'user_id': 'u7', 'xp': 700, 'total': 10}
+    assert leaderboard.rank('nobody') is None
+
+def test_cohort_views():
+    leaderboard = _leaderboard()
+    assert [e['user_id'] for e in leaderboard.top(10, 'AI')] == ['u9', 'u7', 'u5', 'u3', 'u1']
+    assert leaderboard.rank('u8', 'CSE') == {'rank': 1, 'user_id': 'u8', 'xp': 800, 'total': 5}
+    assert leaderboard.rank('u8', 'AI') is None
+
+def test_around():
+    leaderboard = _leaderboard()
+    assert [e['rank'] for e in leaderboard.around('u5', radius=2)] == [3, 4, 5, 6, 7]
+    assert [e['user_id'] for e in leaderboard.around('u9', radius=1)] == ['u9', 'u8']
+    assert leaderboard.around('nobody') == []
+
+def test_set_xp_is_idempotent_and_add_xp_accumulates():
+    leaderboard = Leaderboard()
+    leaderboard.set_xp('u1', 100, 'AI')
+    leaderboard.set_xp('u1', 100, 'AI')
+    leaderboard.add_xp('u1', 50, 'AI')
+    assert leaderboard.rank('u1')['xp'] == 150
+    assert leaderboard.rank('u1', 'AI')['xp'] == 150
+
+def test_set_many_fills_global_and_cohort_sets():
+    leaderboard = Leaderboard()
+    leaderboard.set_many([('u1', 10, 'AI'), ('u2', 30, None), (3, 20, 'AI')])
+    assert [e['user_id'] for e in leaderboard.top(5)] == ['u2', '3', 'u1']
+    assert [e['user_id'] for e in leaderboard.top(5, 'AI')] == ['3', 'u1']
+
+def test_set_xp_moves_users_between_cohorts():
+    leaderboard = Leaderboard()
+    leaderboard.set_xp('u1', 100, 'CSE')
+    leaderboard.set_xp('u2', 50, 'CSE')
+    leaderboard.set_xp('u1', 120, 'AI', previous_cohort='CSE')
+    assert [e['user_id'] for e in leaderboard.top(5, 'CSE')] == ['u2']
+    assert leaderboard.rank('u1', 'AI') == {'rank': 1, 'user_id': 'u1', 'xp': 120, 'total': 1}
+    assert leaderboard.rank('u1')['xp'] == 120
+
+    # An unchanged cohort is left alone
+    leaderboard.set_xp('u2', 60, 'CSE', previous_cohort='CSE')
+    assert leaderboard.rank('u2', 'CSE')['xp'] == 60
+
+class RecordingBackend(InMemorySortedSet):
+    def __init__(self):
+        super().__init__()
+        self.executed = 0
+
+    def execute(self):
+        self.executed += 1
+        return []
+
+def test_set_xp_writes_through_one_pipeline():
+    backend = RecordingBackend()
+    Leaderboard(backend).set_xp('u1', 10, 'AI', previous_cohort='CSE')
+    assert backend.executed == 1
+
+def test_defaults_stage_keeps_the_cohort_it_replaces():
+    stage = GamificationSystem._defaults_stage('u1', 'AI')['$set']
+    assert stage['cohort'] == 'AI'
+    assert stage['previous_cohort'] == {'$ifNull': ['$cohort', None]}
+
+class StoredProgress:
+    """user_progress whose bulk writes apply or not as told, and whose reads return `document`"""
+
+    def __init__(self, document, modified):
+        self.document = document
+        self.modified = modified
+
+    async def bulk_write(self, operations, ordered=True):
+        return SimpleNamespace(modified_count=self.modified)
+
+    async def find_one(self, query, projection=None):
+        return self.document
+
+def _complete_novice(stored_xp, modified):
+    leaderboard = Leaderboard()
+    db = SimpleNamespace(user_progress=StoredProgress({'xp': stored_xp, 'cohort': 'AI'}, modified))
+    system = GamificationSystem(db, leaderboard=leaderboard)
+    progress = UserProgress('u1', cohort='AI')
+    progress.xp = 100
+    progress.stats['total_notes'] = Achievement.ACHIEVEMENTS['NOTE_TAKER_NOVICE']['requirement']
+    assert asyncio.run(system.check_achievements(progress, {'total_notes'}))
+    return leaderboard
+
+def test_completion_credits_the_stored_xp():
+    points = Achievement.ACHIEVEMENTS['NOTE_TAKER_NOVICE']['points']
+    leaderboard = _complete_novice(100 + points, modified=2)
+    assert leaderboard.rank('u1')['xp'] == 100 + points
+    assert leaderboard.rank('u1', 'AI')['xp'] == 100 + points
+
+def test_completion_another_worker_won_credits_nothing_extra():
+    # The guarded update matched nothing, so the stored XP is unchanged
+    leaderboard = _complete_novice(100, modified=0)
+    assert leaderboard.rank('u1')['xp'] == 100
+
+def test_systems_do_not_share_leaderboards():
+    first, second = Leaderboard(), Leaderboard()
+    GamificationSystem(SimpleNamespace(user_progress=None), leaderboard=first)
+    GamificationSystem(SimpleNamespace(user_progress=None), leaderboard=second)
+    progress = UserProgress('u1')
+    progress.add_xp(50)
+    assert first.rank('u1') is None
+    assert second.rank('u1') is None
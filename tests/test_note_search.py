@@ -0,0 +1,137 @@
+import re
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from services.note_search import InvertedIndex, NoteSearch, note_terms, snippet, tokenize
+
+def _index():
+    index = InvertedIndex()
+    index.add('n1', 'alice', 'Algorithms', 'Sorting and searching algorithms in depth')
+    index.add('n2', 'alice', 'Databases', 'Indexes make searching fast; algorithms for B-trees')
+    index.add('n3', 'alice', 'Networks', 'Routing protocols')
+    index.add('n4', 'bob', 'Algorithms', 'Bob also studies algorithms')
+    return index
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize('The Art of Computer Programming') == ['art', 'computer', 'programming']
+    assert note_terms('B b', 'a b c') == ['b', 'c']
+
+def test_title_matches_rank_first():
+    results = _index().search('alice', 'algorithms')
+    assert [r['id'] for r in results] == ['n1', 'n2']
+    assert results[0]['score'] > results[1]['score']
+
+def test_prefix_matches_while_typing():
+    assert [r['id'] for r in _index().search('alice', 'algo')] == ['n1', 'n2']
+    assert [r['id'] for r in _index().search('alice', 'rout')] == ['n3']
+
+def test_every_query_word_must_match():
+    index = _index()
+    assert [r['id'] for r in index.search('alice', 'searching indexes')] == ['n2']
+    assert index.search('alice', 'routing algorithms') == []
+    assert index.search('alice', 'the of') == []
+
+def test_search_is_per_user():
+    index = _index()
+    assert [r['id'] for r in index.search('bob', 'algorithms')] == ['n4']
+    assert index.search('carol', 'algorithms') == []
+
+def test_limit():
+    assert len(_index().search('alice', 'algorithms', limit=1)) == 1
+
+def test_readding_a_note_replaces_its_terms():
+    index = _index()
+    index.add('n3', 'alice', 'Networks', 'Congestion control')
+    assert index.search('alice', 'routing') == []
+    assert [r['id'] for r in index.search('alice', 'congestion')] == ['n3']
+
+def test_remove_drops_unused_terms():
+    index = _index()
+    index.remove('n3')
+    index.remove('n3')
+    assert index.search('alice', 'routing') == []
+    assert 'routing' not in index._users['alice']['terms']
+    assert [r['id'] for r in index.search('alice', 'algorithms')] == ['n1', 'n2']
+
+def test_snippet_marks_prefixes_and_escapes_html():
+    text = 'x' * 200 + ' <b>Algorithms</b> rule'
+    result = snippet(text, ['algo'], width=60)
+    assert '<mark>Algorithms</mark>' in result
+    assert '&lt;b&gt;' in result
+    assert result.startswith('…')
+
+NOTES = [
+    {'_id': 'n1', 'username': 'alice', 'title': 'Algorithms', 'content': 'Sorting and searching algorithms in depth'},
+    {'_id': 'n2', 'username': 'alice', 'title': 'Databases', 'content': 'Indexes make searching fast; algorithms for B-trees'},
+    {'_id': 'n3', 'username': 'alice', 'title': 'Networks', 'content': 'Routing protocols'},
+    {'_id': 'n4', 'username': 'bob', 'title': 'Algorithms', 'content': 'Bob also studies algorithms'},
+]
+
+class FakeCursor(list):
+    def __init__(self, documents, error=None):
+        super().__init__(documents)
+        self.error = error
+
+    def __iter__(self):
+        if self.error:
+            raise self.error
+        return super().__iter__()
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, count):
+        return FakeCursor(self[:count], self.error)
+
+class FakeNotes:
+    """Notes collection understanding just the queries NoteSearch sends; $text has no stemming"""
+
+    def __init__(self, text_index=True, error_code=27):
+        self.notes = [{**note, 'terms': note_terms(note['title'], note['content'])} for note in NOTES]
+        self.text_index = text_index
+        self.error_code = error_code
+        self.queries = []
+
+    def _matches(self, note, query):
+        if note['username'] != query['username']:
+            return False
+        if '$text' in query and not set(query['$text']['$search'].split()) & set(note['terms']):
+            return False
+        if 'terms' in query and not set(query['terms']['$all']) <= set(note['terms']):
+            return False
+        return all(
+            any(re.match(clause['terms']['$regex'], term) for term in note['terms'])
+            for clause in query.get('$and', [])
+        )
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        if '$text' in query and not self.text_index:
+            return FakeCursor([], OperationFailure('text index required for $text query', self.error_code))
+        return FakeCursor({**note, 'score': 1.0} for note in self.notes if self._matches(note, query))
+
+@pytest.mark.parametrize('text_index', [True, False])
+def test_note_search_requires_every_word(text_index):
+    search = NoteSearch(FakeNotes(text_index))
+    assert [r['id'] for r in search.search('alice', 'searching indexes')] == ['n2']
+    assert search.search('alice', 'routing algorithms') == []
+    assert [r['id'] for r in search.search('alice', 'rout')] == ['n3']
+    assert [r['id'] for r in search.search('bob', 'algorithms')] == ['n4']
+
+def test_note_search_uses_the_text_index():
+    collection = FakeNotes()
+    results = NoteSearch(collection).search('alice', 'algorithms searching')
+    assert {r['id'] for r in results} == {'n1', 'n2'}
+    assert collection.queries[0]['terms'] == {'$all': ['algorithms', 'searching']}
+
+def test_note_search_falls_back_without_a_text_index():
+    collection = FakeNotes(text_index=False)
+    results = NoteSearch(collection).search('alice', 'algo')
+    assert [r['id'] for r in results] == ['n1', 'n2']
+    assert results[0]['score'] > results[1]['score']
+    assert collection.queries[1] == {'username': 'alice'}
+
+def test_note_search_reraises_other_failures():
+    with pytest.raises(OperationFailure):
+        NoteSearch(FakeNotes(text_index=False, error_code=2)).search('alice', 'algorithms')
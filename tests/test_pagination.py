@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.pagination import (
+    cursor_values, decode_cursor, encode_cursor, keyset_filter, page_size, MAX_PAGE_SIZE
+)
+
+SORT = [('created_at', -1), ('_id', -1)]
+
+def test_cursor_round_trip_keeps_bson_types():
+    values = {'created_at': datetime(2026, 3, 1, 12, 30), '_id': ObjectId()}
+    assert decode_cursor(encode_cursor(values), SORT) == values
+
+@pytest.mark.parametrize('token', ['not base64!', encode_cursor([1, 2]), encode_cursor('text'), ''])
+def test_malformed_cursors_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+@pytest.mark.parametrize('values', [{}, {'created_at': datetime(2026, 1, 1)}, {'_id': 1}])
+def test_cursors_missing_sort_fields_raise_value_error(values):
+    token = encode_cursor(values)
+    assert decode_cursor(token) == values
+    with pytest.raises(ValueError, match='missing'):
+        decode_cursor(token, SORT)
+
+def test_keyset_filter_descending():
+    after = {'created_at': 5, '_id': 9}
+    assert keyset_filter(SORT, after) == {'$or': [
+        {'created_at': {'$lt': 5}},
+        {'created_at': 5, '_id': {'$lt': 9}}
+    ]}
+
+def test_keyset_filter_mixed_directions():
+    sort = [('due_date', 1), ('status', -1), ('_id', 1)]
+    after = {'due_date': 1, 'status': 'b', '_id': 3}
+    assert keyset_filter(sort, after) == {'$or': [
+        {'due_date': {'$gt': 1}},
+        {'due_date': 1, 'status': {'$lt': 'b'}},
+        {'due_date': 1, 'status': 'b', '_id': {'$gt': 3}}
+    ]}
+
+def test_keyset_filter_rejects_incomplete_cursor():
+    with pytest.raises(ValueError):
+        keyset_filter(SORT, {'created_at': 5})
+
+def test_cursor_values_follow_dotted_fields():
+    document = {'_id': 1, 'challenge': {'end_date': 7}, 'completed_at': None}
+    sort = [('challenge.end_date', 1), ('completed_at', -1), ('missing.field', 1), ('_id', 1)]
+    assert cursor_values(document, sort) == {
+        'challenge.end_date': 7, 'completed_at': None, 'missing.field': None, '_id': 1
+    }
+
+def test_page_size_is_clamped():
+    assert page_size(None) == 20
+    assert page_size('5') == 5
+    assert page_size('abc') == 20
+    assert page_size('0') == 1
+    assert page_size(10 ** 6) == MAX_PAGE_SIZE
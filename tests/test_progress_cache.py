@@ -0,0 +1,74 @@
+import pytest
+
+from app.gamification import progress_cache
+from app.gamification.progress_cache import ProgressCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress_cache.time, 'monotonic', clock)
+    return clock
+
+def _document(version=1, xp=0):
+    return {'user_id': 'u1', 'xp': xp, 'version': version, 'stats': {'total_notes': 0}}
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ProgressCache(ttl_seconds=60)
+    cache.put('u1', _document())
+    clock.now += 59
+    assert cache.get('u1') == _document()
+    clock.now += 1
+    assert cache.get('u1') is None
+    assert cache.stats()['size'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_invalidate_drops_entries(clock):
+    cache = ProgressCache()
+    cache.put('u1', _document())
+    cache.put(2, _document())
+    cache.invalidate('u1', 2, 'unknown')
+    assert cache.get('u1') is None
+    assert cache.get('2') is None
+
+def test_older_versions_do_not_replace_newer_ones(clock):
+    cache = ProgressCache(ttl_seconds=60)
+    assert cache.put('u1', _document(version=5, xp=50))
+    assert cache.put('u1', _document(version=4, xp=40)) is False
+    assert cache.get('u1')['xp'] == 50
+    assert cache.stats()['stale_puts'] == 1
+
+    assert cache.put('u1', _document(version=5, xp=55))
+    assert cache.get('u1')['xp'] == 55
+
+    # Once the newer entry has expired it no longer vouches for anything
+    clock.now += 60
+    assert cache.put('u1', _document(version=4, xp=40))
+    assert cache.get('u1')['xp'] == 40
+
+def test_entries_are_private_copies(clock):
+    cache = ProgressCache()
+    document = _document()
+    cache.put('u1', document)
+    document['stats']['total_notes'] = 10
+    cached = cache.get('u1')
+    assert cached['stats']['total_notes'] == 0
+    cached['stats']['total_notes'] = 20
+    assert cache.get('u1')['stats']['total_notes'] == 0
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ProgressCache(max_size=2)
+    cache.put('a', _document())
+    cache.put('b', _document())
+    cache.get('a')
+    cache.put('c', _document())
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.evictions == 1
@@ -0,0 +1,89 @@
+"""Concurrent record_activity calls for one user against a real MongoDB.
+
+Uses the server at MONGODB_URI with a throwaway database; skipped when
+motor is not installed or no server answers.
+"""
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+
+motor_asyncio = pytest.importorskip('motor.motor_asyncio')
+from pymongo.errors import PyMongoError
+
+from app.config import Config
+from app.gamification.achievements import Achievement, GamificationSystem, UserProgress
+
+CALLS = 100
+
+async def _with_database(check):
+    client = motor_asyncio.AsyncIOMotorClient(Config.MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        try:
+            await client.admin.command('ping')
+        except PyMongoError as e:
+            pytest.skip(f"No MongoDB at {Config.MONGODB_URI}: {e}")
+        db = client[f"{Config.MONGODB_NAME}_test_{uuid.uuid4().hex[:8]}"]
+        try:
+            await check(db)
+        finally:
+            await client.drop_database(db.name)
+    finally:
+        client.close()
+
+def _expected(activities):
+    """(xp, stats, completed achievement keys) after applying `activities` in any order"""
+    progress = UserProgress('expected')
+    for activity_type, additional_data in activities:
+        xp, increments = UserProgress.activity_increments(activity_type, additional_data)
+        progress.xp += xp
+        for stat, amount in increments.items():
+            progress.stats[stat] += amount
+    if progress.stats['study_sessions']:
+        # Every session falls on the same day
+        progress.stats['longest_study_streak'] = 1
+    completed = {
+        key for key, rule in Achievement.ACHIEVEMENTS.items()
+        if progress.get_stat(rule['stat']) >= rule['requirement']
+    }
+    xp = progress.xp + sum(Achievement.ACHIEVEMENTS[key]['points'] for key in completed)
+    return xp, progress.stats, completed
+
+async def _record_concurrently(db, activities):
+    system = GamificationSystem(db)
+    await asyncio.gather(*(
+        system.record_activity('student', activity_type, additional_data)
+        for activity_type, additional_data in activities
+    ))
+
+    xp, stats, completed = _expected(activities)
+    document = await db.user_progress.find_one({'user_id': 'student'})
+    assert document['xp'] == xp
+    assert document['level'] == UserProgress.calculate_level(xp)
+    for stat, value in stats.items():
+        assert document['stats'][stat] == value, stat
+    assert {a['key'] for a in document['achievements'] if a['completed']} == completed
+    assert document['activity_counts'] == dict(Counter(
+        activity_type for activity_type, _ in activities if activity_type in UserProgress.XP_REWARDS
+    ))
+    # Rebuilding from the counts gives the XP that was awarded, so nothing was counted twice
+    assert UserProgress.recompute(document) == (xp, document['level'])
+
+async def _notes(db):
+    await _record_concurrently(db, [('create_note', None)] * CALLS)
+
+async def _mixed(db):
+    activities = (
+        [('create_note', None)] * 55
+        + [('complete_task', {'on_time': True})] * 25
+        + [('complete_task', {'on_time': False})] * 10
+        + [('study_session', {'duration': 30})] * 10
+    )
+    await _record_concurrently(db, activities)
+
+def test_concurrent_notes_lose_no_updates():
+    asyncio.run(_with_database(_notes))
+
+def test_concurrent_mixed_activities_lose_no_updates():
+    asyncio.run(_with_database(_mixed))
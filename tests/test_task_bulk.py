@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+
+from services.task_bulk import TaskBulkProcessor, parse_items, MAX_BULK_ITEMS
+from services.task_reminders import reminder_offsets
+
+NOW = datetime(2026, 10, 1, 9, 0)
+
+def _validate(item, index=0):
+    return TaskBulkProcessor(collection=None)._validate(index, item, 'bob', NOW)
+
+def test_create():
+    operation, result = _validate({'title': 'Essay', 'due_date': '2026-10-20', 'description': 'Draft'})
+    assert result['status'] == 'created'
+    assert operation == InsertOne({
+        '_id': ObjectId(result['id']),
+        'username': 'bob',
+        'title': 'Essay',
+        'description': 'Draft',
+        'due_date': datetime(2026, 10, 20),
+        'status': 'pending',
+        'created_at': NOW
+    })
+
+def test_update_is_scoped_to_the_user():
+    task_id = str(ObjectId())
+    operation, result = _validate({'id': task_id, 'status': 'in_progress'}, index=3)
+    assert result == {'index': 3, 'status': 'updated', 'id': task_id}
+    assert operation == UpdateOne(
+        {'_id': ObjectId(task_id), 'username': 'bob'},
+        {'$set': {'status': 'in_progress', 'updated_at': NOW}}
+    )
+
+def test_update_to_completed_stamps_completed_at():
+    task_id = str(ObjectId())
+    operation, _ = _validate({'op': 'update', 'id': task_id, 'status': 'completed'})
+    assert operation == UpdateOne(
+        {'_id': ObjectId(task_id), 'username': 'bob'},
+        {'$set': {'status': 'completed', 'completed_at': NOW, 'updated_at': NOW}}
+    )
+
+def test_complete():
+    task_id = str(ObjectId())
+    operation, result = _validate({'op': 'complete', 'id': task_id})
+    assert result['status'] == 'completed'
+    assert operation == UpdateOne(
+        {'_id': ObjectId(task_id), 'username': 'bob'},
+        {'$set': {'status': 'completed', 'completed_at': NOW, 'updated_at': NOW}}
+    )
+
+@pytest.mark.parametrize('item, error', [
+    ('not an object', 'Item must be an object'),
+    ({'title': 'Essay'}, 'Missing due_date'),
+    ({'title': '', 'due_date': '2026-10-20'}, 'Missing title'),
+    ({'title': 'Essay', 'due_date': '20/10/2026'}, 'due_date must be a YYYY-MM-DD date'),
+    ({'title': 'Essay', 'due_date': 20261020}, 'due_date must be a YYYY-MM-DD date'),
+    ({'title': 'Essay', 'due_date': '2026-10-20', 'status': 'done'}, 'status must be one of'),
+    ({'title': 42, 'due_date': '2026-10-20'}, 'title must be a string'),
+    ({'op': 'delete', 'id': str(ObjectId())}, 'Unknown op: delete'),
+    ({'op': 'complete', 'id': 'nope'}, 'A valid task id is required'),
+    ({'op': 'update'}, 'A valid task id is required'),
+    ({'id': str(ObjectId())}, 'Nothing to update'),
+])
+def test_invalid_items_are_rejected(item, error):
+    operation, result = _validate(item, index=7)
+    assert operation is None
+    assert result['index'] == 7
+    assert result['status'] == 'error'
+    assert result['error'].startswith(error)
+
+def test_repeated_dates_are_parsed_once():
+    processor = TaskBulkProcessor(collection=None)
+    for i in range(3):
+        processor._validate(i, {'title': f't{i}', 'due_date': '2026-10-20'}, 'bob', NOW)
+    assert list(processor._dates) == ['2026-10-20']
+
+def test_parse_items_accepts_json_arrays_and_ndjson():
+    assert parse_items(b'[{"title": "a"}, {"title": "b"}]') == [{'title': 'a'}, {'title': 'b'}]
+    assert parse_items('{"title": "a"}\n\n{"title": "b"}\n', 'application/x-ndjson') == [{'title': 'a'}, {'title': 'b'}]
+
+def test_parse_items_limits_batch_size():
+    with pytest.raises(ValueError):
+        parse_items('[' + ','.join(['{}'] * (MAX_BULK_ITEMS + 1)) + ']')
+
+def test_reminder_settings_are_stored_on_create_and_update():
+    operation, result = _validate({'title': 'Exam', 'due_date': '2026-10-20', 'reminder_frequency': 'weekly'})
+    assert result['status'] == 'created'
+    assert operation._doc['reminder_frequency'] == 'weekly'
+
+    task_id = str(ObjectId())
+    operation, _ = _validate({'id': task_id, 'reminder_frequency': 'custom', 'reminder_offsets_hours': [1, 24, 1]})
+    assert operation == UpdateOne(
+        {'_id': ObjectId(task_id), 'username': 'bob'},
+        {'$set': {'reminder_frequency': 'custom', 'reminder_offsets_hours': [24, 1], 'updated_at': NOW}}
+    )
+
+@pytest.mark.parametrize('settings, error', [
+    ({'reminder_frequency': 'hourly'}, 'reminder_frequency must be one of'),
+    ({'reminder_frequency': 'custom'}, 'custom reminders need reminder_offsets_hours'),
+    ({'reminder_offsets_hours': []}, 'reminder_offsets_hours must be a list'),
+    ({'reminder_offsets_hours': [5]}, 'reminder_offsets_hours must be a list'),
+    ({'reminder_offsets_hours': [True]}, 'reminder_offsets_hours must be a list'),
+    ({'reminder_offsets_hours': 24}, 'reminder_offsets_hours must be a list'),
+])
+def test_invalid_reminder_settings_are_rejected(settings, error):
+    operation, result = _validate({'title': 'Exam', 'due_date': '2026-10-20', **settings})
+    assert operation is None
+    assert result['error'].startswith(error)
+
+def test_stored_settings_drive_the_reminder_offsets():
+    task = {'reminder_frequency': 'custom', 'reminder_offsets_hours': [24, 1]}
+    assert reminder_offsets(task) == [24, 1]
+    assert reminder_offsets({'reminder_frequency': 'weekly'}) == (336, 168)
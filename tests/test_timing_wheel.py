@@ -0,0 +1,46 @@
+import pytest
+
+from utils.timing_wheel import TimingWheel
+
+def test_items_fire_in_order_once():
+    wheel = TimingWheel(tick_seconds=1, wheel_size=8, levels=2)
+    wheel.schedule(5, 'b')
+    wheel.schedule(2, 'a')
+    wheel.schedule(5.5, 'c')
+    assert len(wheel) == 3
+    assert wheel.advance(1) == []
+    assert wheel.advance(4) == ['a']
+    assert wheel.advance(6) == ['b', 'c']
+    assert wheel.advance(10) == []
+    assert len(wheel) == 0
+
+def test_items_cascade_down_from_higher_levels():
+    wheel = TimingWheel(tick_seconds=1, wheel_size=4, levels=3)
+    times = [3, 4, 9, 17, 30, 63]
+    for t in times:
+        wheel.schedule(t, t)
+    fired = []
+    for now in range(1, 64):
+        for t in wheel.advance(now):
+            assert t == now
+            fired.append(t)
+    assert fired == times
+
+def test_large_jump_fires_everything_due():
+    wheel = TimingWheel(tick_seconds=60, wheel_size=64, levels=3, start=0)
+    wheel.schedule(60 * 5000, 'late')
+    wheel.schedule(60 * 10, 'early')
+    assert wheel.advance(60 * 100) == ['early']
+    assert wheel.advance(60 * 6000) == ['late']
+
+def test_past_items_fire_on_next_advance():
+    wheel = TimingWheel(tick_seconds=1, start=100)
+    wheel.schedule(50, 'overdue')
+    assert wheel.advance(100) == ['overdue']
+
+def test_rejects_items_beyond_the_span():
+    wheel = TimingWheel(tick_seconds=1, wheel_size=4, levels=2)
+    wheel.schedule(15, 'last')
+    with pytest.raises(ValueError):
+        wheel.schedule(16, 'too far')
+    assert len(wheel) == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from app.gamification.achievements import (
+    Achievement, UserProgress, LEVEL_XP, LEVEL_XP_STEP, MAX_TABLE_LEVEL
+)
+
+@pytest.mark.parametrize('xp, level', [
+    (0, 1), (99, 1), (100, 2), (224, 2), (225, 3), (2499, 9), (2500, 10)
+])
+def test_calculate_level(xp, level):
+    assert UserProgress.calculate_level(xp) == level
+
+def test_levels_match_xp_for_level():
+    for level in (1, 2, 17, MAX_TABLE_LEVEL, MAX_TABLE_LEVEL + 1, 5000):
+        threshold = UserProgress.xp_for_level(level)
+        assert UserProgress.calculate_level(threshold) == level
+        if level > 1:
+            assert UserProgress.calculate_level(threshold - 1) == level - 1
+
+def test_level_beyond_the_table():
+    assert LEVEL_XP[-1] == LEVEL_XP_STEP * MAX_TABLE_LEVEL ** 2
+    assert UserProgress.calculate_level(LEVEL_XP_STEP * 2000 ** 2 + 1) == 2000
+
+def test_add_xp_reports_level_ups():
+    progress = UserProgress('u1')
+    assert progress.add_xp(50) is False
+    assert progress.add_xp(50) is True
+    assert (progress.xp, progress.level) == (100, 2)
+
+def _document(**fields):
+    return {'user_id': 'u1', 'xp': 0, 'achievements': [], **fields}
+
+def test_recompute_from_activity_counts():
+    rewards = UserProgress.XP_REWARDS
+    document = _document(xp_baseline=0, activity_counts={'create_note': 3, 'daily_login': 2})
+    xp = 3 * rewards['create_note'] + 2 * rewards['daily_login']
+    assert UserProgress.recompute(document) == (xp, UserProgress.calculate_level(xp))
+
+def test_recompute_adds_baseline_and_completed_achievements():
+    points = Achievement.ACHIEVEMENTS['NOTE_TAKER_NOVICE']['points']
+    document = _document(
+        xp_baseline=5000,
+        activity_counts={'create_note': 1, 'unknown_activity': 100},
+        achievements=[
+            {'key': 'NOTE_TAKER_NOVICE', 'completed': True},
+            {'key': 'NOTE_TAKER_EXPERT', 'completed': False},
+            {'key': 'RETIRED_ACHIEVEMENT', 'completed': True}
+        ]
+    )
+    xp = 5000 + UserProgress.XP_REWARDS['create_note'] + points
+    assert UserProgress.tracked_xp(document) == xp - 5000
+    assert UserProgress.recompute(document) == (xp, UserProgress.calculate_level(xp))
+
+def test_recompute_skips_documents_without_a_baseline():
+    # Legacy documents earned XP before activity_counts existed; rebuilding them from counts would wipe it
+    assert UserProgress.recompute(_document(xp=5000, activity_counts={'create_note': 1})) is None
+    assert UserProgress.recompute(_document(xp=5000, xp_baseline=None)) is None
+
+def test_baseline_survives_serialization():
+    progress = UserProgress.from_dict(_document(xp=40, xp_baseline=30))
+    assert progress.to_document()['xp_baseline'] == 30
+    assert UserProgress.from_dict(_document(xp=40)).xp_baseline is None
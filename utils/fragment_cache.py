@@ -0,0 +1,63 @@
+# utils/fragment_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+
+class FragmentCache:
+    """Per-user cache of rendered page fragments, keyed by a per-user data version.
+
+    Writes call `bump(user)`; a cached entry is only served while it was
+    rendered at the user's current version. Versions live in this process,
+    so `ttl_seconds` bounds how long a fragment can miss a write handled by
+    another worker.
+
+    Only users with a cached entry keep a version of their own. Everyone
+    else reads the shared write counter, which every bump advances, so a
+    render that overlaps any write is not cached and the version map never
+    grows past `max_users`.
+    """
+
+    def __init__(self, max_users=5000, ttl_seconds=60):
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self._writes = 0
+        self._versions = {}            # user -> version of their cached entry
+        self._entries = OrderedDict()  # user -> (version, expires_at, fragments)
+        # Request threads share the cache; every read or write of it holds this lock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user):
+        with self._lock:
+            return self._versions.get(user, self._writes)
+
+    def bump(self, user):
+        with self._lock:
+            self._writes += 1
+            self._versions.pop(user, None)
+            self._entries.pop(user, None)
+
+    def get(self, user):
+        with self._lock:
+            entry = self._entries.get(user)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, user, version, fragments):
+        """Store fragments rendered from data read at `version`"""
+        with self._lock:
+            if version != self._versions.get(user, self._writes):
+                # A write landed while rendering; the fragments may already be stale
+                return
+            self._versions[user] = version
+            self._entries[user] = (version, time.monotonic() + self.ttl, fragments)
+            self._entries.move_to_end(user)
+            while len(self._entries) > self.max_users:
+                evicted, _ = self._entries.popitem(last=False)
+                self._versions.pop(evicted, None)
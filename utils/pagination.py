@@ -0,0 +1,66 @@
+# utils/pagination.py
+
+import base64
+import binascii
+from bson import json_util
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort key values of the last item on a page"""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(token, sort=None):
+    """Inverse of encode_cursor; raises ValueError for malformed tokens.
+
+    With `sort` the cursor must also hold a value for every sort field,
+    so it can be passed straight to keyset_filter.
+    """
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    if sort is not None:
+        missing = [field for field, _ in sort if field not in values]
+        if missing:
+            raise ValueError(f"Invalid cursor: missing {', '.join(missing)}")
+    return values
+
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+def keyset_filter(sort, after):
+    """Filter selecting the documents that come after `after` in `sort` order.
+
+    `sort` is a list of (field, direction) pairs ending with a unique field
+    (normally _id); `after` maps those fields to the last returned values.
+    For [("a", -1), ("_id", -1)] this is
+    {"$or": [{"a": {"$lt": a}}, {"a": a, "_id": {"$lt": id}}]}.
+    Raises ValueError if `after` lacks one of the fields.
+    """
+    missing = [field for field, _ in sort if field not in after]
+    if missing:
+        raise ValueError(f"Invalid cursor: missing {', '.join(missing)}")
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: after[f] for f, _ in sort[:i]}
+        clause[field] = {"$lt" if direction < 0 else "$gt": after[field]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+def cursor_values(document, sort):
+    """Sort key values of a document, for encode_cursor"""
+    values = {}
+    for field, _ in sort:
+        value = document
+        for part in field.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        values[field] = value
+    return values
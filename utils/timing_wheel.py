@@ -0,0 +1,75 @@
+# utils/timing_wheel.py
+
+import math
+
+class TimingWheel:
+    """Hierarchical timing wheel: O(1) schedule, and each tick only touches its own slot.
+
+    Level 0 has `wheel_size` slots of `tick_seconds`; each higher level's
+    slot spans a full turn of the level below. Items in a higher-level slot
+    are cascaded down when the level below wraps around to it, so they are
+    re-sorted only a handful of times before firing. Times are POSIX
+    timestamps (seconds).
+    """
+
+    def __init__(self, tick_seconds=60, wheel_size=64, levels=3, start=0):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.levels = levels
+        self.span_ticks = wheel_size ** levels
+        self._wheels = [[[] for _ in range(wheel_size)] for _ in range(levels)]
+        self._tick = self._to_tick(start)
+        self._due = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _to_tick(self, timestamp):
+        return math.floor(timestamp / self.tick_seconds)
+
+    def _place(self, tick, item):
+        delta = tick - self._tick
+        if delta <= 0:
+            self._due.append(item)
+            return
+        for level in range(self.levels):
+            if delta < self.wheel_size ** (level + 1):
+                slot = (tick // self.wheel_size ** level) % self.wheel_size
+                self._wheels[level][slot].append((tick, item))
+                return
+        raise ValueError(f'Cannot schedule more than {self.span_ticks * self.tick_seconds} seconds ahead')
+
+    def schedule(self, timestamp, item):
+        """Fire `item` on the first advance() at or after `timestamp`"""
+        self._place(self._to_tick(timestamp), item)
+        self._count += 1
+
+    def advance(self, now):
+        """Move the wheel up to `now` and return every item that came due, in order"""
+        target = self._to_tick(now)
+        fired, self._due = self._due, []
+        while self._tick < target:
+            if self._count == len(fired):
+                # Nothing left in the wheel; skip the empty ticks
+                self._tick = target
+                break
+            self._tick += 1
+            # Cascade every level whose slot the level below has just wrapped onto,
+            # highest first so items can fall more than one level in the same tick
+            wrapped = 1
+            while wrapped < self.levels and self._tick % self.wheel_size ** wrapped == 0:
+                wrapped += 1
+            for level in range(wrapped - 1, 0, -1):
+                slot = self._wheels[level][(self._tick // self.wheel_size ** level) % self.wheel_size]
+                entries = slot[:]
+                slot.clear()
+                for tick, item in entries:
+                    self._place(tick, item)
+            fired.extend(self._due)
+            self._due = []
+            slot = self._wheels[0][self._tick % self.wheel_size]
+            fired.extend(item for _, item in slot)
+            slot.clear()
+        self._count -= len(fired)
+        return fired